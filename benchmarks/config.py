@@ -0,0 +1,42 @@
+"""Access cost of `Config` (Box) versus its frozen snapshot
+
+Usage:
+    python benchmarks/config.py [--reads 200000]
+"""
+import argparse
+import pickle
+import timeit
+
+from minikts.config import Config
+
+def make_config():
+    return Config({
+        "catboost": {"depth": 6, "learning_rate": 0.03, "iterations": 1000},
+        "split": {"n_splits": 5, "shuffle": True, "random_state": 42},
+    }, box_dots=True)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--reads", type=int, default=200000)
+    args = arg_parser.parse_args()
+    hparams = make_config()
+    frozen = hparams.freeze()
+    plain = hparams.to_dict()
+    cases = [
+        ("Box attr", "hparams.catboost.depth"),
+        ("Box dotted", 'hparams["catboost.depth"]'),
+        ("frozen attr", "frozen.catboost.depth"),
+        ("frozen dotted", 'frozen["catboost.depth"]'),
+        ("plain dict", 'plain["catboost"]["depth"]'),
+    ]
+    namespace = {"hparams": hparams, "frozen": frozen, "plain": plain}
+    for name, statement in cases:
+        elapsed = min(timeit.repeat(statement, globals=namespace, number=args.reads, repeat=3))
+        print(f"{name:<16} {elapsed / args.reads * 1e9:>8.0f} ns per read")
+    for name, value in [("Box", hparams), ("frozen", frozen)]:
+        data = pickle.dumps(value)
+        elapsed = min(timeit.repeat(lambda: pickle.loads(pickle.dumps(value)), number=1000, repeat=3))
+        print(f"{name + ' pickle':<16} {elapsed / 1000 * 1e6:>8.1f} us round trip, {len(data)} B")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Throughput of stdout parsing in lines per second
+
+Usage:
+    python benchmarks/parsing.py [--lines 40000] [--repeat 3]
+"""
+import argparse
+import io
+import time
+
+from minikts.parsing import Patterns, StreamParser
+
+def catboost_log(n_lines):
+    for step in range(n_lines):
+        yield f"{step}:\tlearn: 0.{step % 997:06d}\ttest: 0.{step % 991:06d}\tbest: 0.5 (1)\ttotal: 1.2s\tremaining: 3.4s"
+
+def lightgbm_log(n_lines):
+    for step in range(n_lines):
+        yield f"[{step + 1}]\tvalid_0's binary_logloss: 0.{step % 997:06d}\tvalid_1's binary_logloss: 0.{step % 991:06d}"
+
+def noise_log(n_lines):
+    for step in range(n_lines):
+        yield f"Warning: some unrelated message number {step}"
+
+def measure(patterns, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        records = []
+        parser = StreamParser(patterns, callbacks=[records.append], output=io.StringIO())
+        start = time.perf_counter()
+        for line in lines:
+            # one write per line and one per newline, like print()
+            parser.write(line)
+            parser.write("\n")
+        parser.flush()
+        best = min(best, time.perf_counter() - start)
+        assert len(records) == len(lines)
+    return len(lines) / best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--lines", type=int, default=40000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    cases = [
+        ("catboost", Patterns.catboost, catboost_log),
+        ("lightgbm", Patterns.lightgbm, lightgbm_log),
+        ("catboost, unmatched lines", Patterns.catboost, noise_log),
+    ]
+    for name, patterns, generate in cases:
+        lines = list(generate(args.lines))
+        print(f"{name:<28} {measure(patterns, lines, args.repeat):>10,.0f} lines/s")
+
+if __name__ == "__main__":
+    main()
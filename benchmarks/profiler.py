@@ -0,0 +1,44 @@
+"""Per-call overhead of `profiler.profile()` on an empty function
+
+Usage:
+    python benchmarks/profiler.py [--calls 1000000] [--repeat 3]
+"""
+import argparse
+import time
+
+from minikts.profiler import Profiler
+
+def empty():
+    pass
+
+def measure(function, n_calls, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(n_calls):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / n_calls
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--calls", type=int, default=1000000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    baseline = measure(empty, args.calls, args.repeat)
+    cases = [
+        ("default", dict()),
+        ("memory", {"memory": True}),
+    ]
+    print(f"{'plain call':<12} {baseline * 1e9:>8.0f} ns")
+    for name, options in cases:
+        profiler = Profiler()
+        for key, value in options.items():
+            profiler.set_option(key, value)
+        profiled = profiler.profile(verbose=False)(empty)
+        n_calls = args.calls if not options else args.calls // 100
+        overhead = measure(profiled, n_calls, args.repeat) - baseline
+        print(f"{name:<12} {overhead * 1e9:>8.0f} ns overhead per call")
+
+if __name__ == "__main__":
+    main()
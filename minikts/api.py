@@ -1,11 +1,58 @@
-import minikts.stl as stl
-from minikts.cache import (fast_global_cache, fast_local_cache, global_cache,
-                           local_cache, process_cache)
-from minikts.callbacks import MatplotlibCallback, LoggerCallback
-from minikts.cli import CLI, config_option
-from minikts.config import config, hparams, load_config
-from minikts.context import context, ctx, init
-from minikts.debug import debug
-from minikts.loggers import NeptuneLogger
-from minikts.parsing import parse_stdout, Patterns as patterns
-from minikts.profiler import profile, profiler
+from typing import TYPE_CHECKING
+
+from minikts.lazy import lazy_exports
+
+# exports are imported on first access, so that `import minikts.api as kts` does not import pandas, rich etc.
+_EXPORTS = {
+    "stl": ("minikts.stl", None),
+    "fast_global_cache": ("minikts.cache", "fast_global_cache"),
+    "fast_local_cache": ("minikts.cache", "fast_local_cache"),
+    "global_cache": ("minikts.cache", "global_cache"),
+    "local_cache": ("minikts.cache", "local_cache"),
+    "process_cache": ("minikts.cache", "process_cache"),
+    "callbacks": ("minikts.callbacks", None),
+    "MatplotlibCallback": ("minikts.callbacks", "MatplotlibCallback"),
+    "LoggerCallback": ("minikts.callbacks", "LoggerCallback"),
+    "MetricBuffer": ("minikts.callbacks", "MetricBuffer"),
+    "PruningCallback": ("minikts.callbacks", "PruningCallback"),
+    "load_metrics": ("minikts.callbacks", "load_metrics"),
+    "CLI": ("minikts.cli", "CLI"),
+    "config_option": ("minikts.cli", "config_option"),
+    "overrides_option": ("minikts.cli", "overrides_option"),
+    "config": ("minikts.config", "config"),
+    "hparams": ("minikts.config", "hparams"),
+    "load_config": ("minikts.config", "load_config"),
+    "context": ("minikts.context", "context"),
+    "ctx": ("minikts.context", "ctx"),
+    "init": ("minikts.context", "init"),
+    "debug": ("minikts.debug", "debug"),
+    "NeptuneLogger": ("minikts.loggers", "NeptuneLogger"),
+    "LocalLogger": ("minikts.loggers", "LocalLogger"),
+    "leaderboard": ("minikts.loggers", "leaderboard"),
+    "query_metrics": ("minikts.loggers", "query_metrics"),
+    "parse_stdout": ("minikts.parsing", "parse_stdout"),
+    "patterns": ("minikts.parsing", "Patterns"),
+    "profile": ("minikts.profiler", "profile"),
+    "profiler": ("minikts.profiler", "profiler"),
+    "step": ("minikts.steps", "step"),
+    "sweep": ("minikts.sweep", "sweep"),
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(globals(), _EXPORTS)
+
+if TYPE_CHECKING:
+    import minikts.stl as stl
+    from minikts.cache import (fast_global_cache, fast_local_cache, global_cache,
+                               local_cache, process_cache)
+    import minikts.callbacks as callbacks
+    from minikts.callbacks import MatplotlibCallback, LoggerCallback, MetricBuffer, PruningCallback, load_metrics
+    from minikts.cli import CLI, config_option, overrides_option
+    from minikts.config import config, hparams, load_config
+    from minikts.context import context, ctx, init
+    from minikts.debug import debug
+    from minikts.loggers import NeptuneLogger, LocalLogger, leaderboard, query_metrics
+    from minikts.parsing import parse_stdout, Patterns as patterns
+    from minikts.profiler import profile, profiler
+    from minikts.steps import step
+    from minikts.sweep import sweep
@@ -0,0 +1,118 @@
+import os
+import shutil
+import hashlib
+import stat
+from pathlib import Path
+from typing import Union
+
+import attr
+
+from minikts.monitoring import WARNING, report
+
+_CHUNK_SIZE = 1 << 20
+_DIGEST_CACHE = dict()
+
+def hash_file(path: Union[Path, str]):
+    """Returns sha256 hex digest of file contents, cached by path, size and mtime"""
+    path = Path(path)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_size, st.st_mtime_ns, st.st_ino)
+    digest = _DIGEST_CACHE.get(key, None)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        digest = _DIGEST_CACHE[key] = sha.hexdigest()
+    return digest
+
+@attr.s
+class BlobStore:
+    """Content-addressed storage of files
+
+    Each distinct content is stored once as a read-only blob named by its sha256 digest.
+    Large files are placed into experiment directories as hardlinks to blobs (or copies,
+    if hardlinks are not supported), so unchanged files take no extra space. Files users
+    edit should be placed as copies, since an editor saving a hardlink in place changes
+    the blob; such blobs are detected by `put` and rewritten.
+
+    Args:
+        dir: directory of the store
+    """
+    dir = attr.ib(type=Path, converter=Path)
+
+    def path(self, digest: str):
+        return self.dir / digest[:2] / digest
+
+    def put(self, src: Union[Path, str]):
+        """Adds a file to the store
+
+        Returns:
+            Digest of the file
+        """
+        digest = hash_file(src)
+        blob_path = self.path(digest)
+        if blob_path.exists() and hash_file(blob_path) != digest:
+            report("blobs", f"Blob [!path]{digest[:12]}[/] was modified through a hardlink, [!alert]replacing[/] it", level=WARNING)
+            blob_path.unlink()
+        if not blob_path.exists():
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = blob_path.with_name(f"{digest}.{os.getpid()}.tmp")
+            shutil.copyfile(src, tmp_path)
+            read_only = stat.S_IMODE(os.stat(src).st_mode) & 0o555 | 0o444
+            os.chmod(tmp_path, read_only)
+            os.replace(tmp_path, blob_path)
+        return digest
+
+    def link(self, digest: str, dest: Union[Path, str]):
+        """Places blob at `dest`, replacing existing file"""
+        blob_path = self.path(digest)
+        dest = Path(dest)
+        if dest.exists():
+            if os.path.samefile(dest, blob_path):
+                return
+            dest.unlink()
+        try:
+            os.link(blob_path, dest)
+        except OSError:
+            shutil.copyfile(blob_path, dest)
+
+    def copy(self, digest: str, dest: Union[Path, str]):
+        """Places a writable copy of blob at `dest`, replacing existing file"""
+        dest = Path(dest)
+        if dest.exists():
+            dest.unlink()
+        shutil.copyfile(self.path(digest), dest)
+
+    def checkout(self, src: Union[Path, str], dest: Union[Path, str], link: bool = True):
+        """Adds `src` to the store and places it at `dest`
+
+        Args:
+            src: source file
+            dest: destination path
+            link: if set to False, places a copy instead of a hardlink
+
+        Returns:
+            Digest of the file
+        """
+        digest = self.put(src)
+        if link:
+            self.link(digest, dest)
+        else:
+            self.copy(digest, dest)
+        return digest
+
+    def get_upload(self, digest: str, backend: str):
+        """Returns id of experiment the blob was uploaded with to `backend`, if any"""
+        marker = self._upload_marker(digest, backend)
+        if not marker.exists():
+            return None
+        return marker.read_text()
+
+    def set_upload(self, digest: str, backend: str, experiment_id: str):
+        marker = self._upload_marker(digest, backend)
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.write_text(str(experiment_id))
+
+    def _upload_marker(self, digest, backend):
+        return self.dir / "uploads" / backend / digest
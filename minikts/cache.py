@@ -1,4 +1,7 @@
+import os
 import abc
+import threading
+import contextlib
 
 import dill
 import pandas as pd
@@ -6,6 +9,9 @@ import pandas as pd
 from minikts.context import ctx
 
 class AbstractCache(abc.ABC):
+    hits = 0
+    misses = 0
+
     @abc.abstractmethod
     def save_object(self, obj, key: str):
         raise NotImplementedError()
@@ -31,7 +37,13 @@ class ProcessCache(AbstractCache):
         self.data[key] = obj
 
     def load_object(self, key):
-        return self.data[key]
+        try:
+            obj = self.data[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return obj
 
     def save_dataframe(self, df, key):
         self.save_object(df, key)
@@ -39,23 +51,53 @@ class ProcessCache(AbstractCache):
     def load_dataframe(self, key):
         return self.load_object(key)
 
+@contextlib.contextmanager
+def _atomic_path(path):
+    """Yields a temporary path which replaces `path` once written
+
+    Concurrent readers see either the old file or the complete new one, and files
+    hardlinked to `path` (e.g. blobs of restored step outputs) are left unchanged.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
 class DiskCache(AbstractCache):
-    """Caches items on disk."""
+    """Caches items on disk, writes are atomic."""
     def save_object(self, obj, key):
         key = self._filter_key(key)
-        dill.dump(obj, open(self.dir / (key + ".dill"), "wb"))
+        with _atomic_path(self.dir / (key + ".dill")) as path:
+            with open(path, "wb") as f:
+                dill.dump(obj, f)
 
     def load_object(self, key):
         key = self._filter_key(key)
-        return dill.load(open(self.dir / (key + ".dill"), "rb"))
+        try:
+            f = open(self.dir / (key + ".dill"), "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        with f:
+            return dill.load(f)
 
     def save_dataframe(self, df, key):
         key = self._filter_key(key)
-        df.to_parquet(self.dir / (key + ".parquet"))
+        with _atomic_path(self.dir / (key + ".parquet")) as path:
+            df.to_parquet(path)
 
     def load_dataframe(self, key):
         key = self._filter_key(key)
-        return pd.read_parquet(self.dir / (key + ".parquet"))
+        path = self.dir / (key + ".parquet")
+        if not path.exists():
+            self.misses += 1
+            raise FileNotFoundError(path)
+        self.hits += 1
+        return pd.read_parquet(path)
 
     @staticmethod
     def _filter_key(key):
@@ -65,9 +107,11 @@ class DiskCache(AbstractCache):
 
 class LocalCache(DiskCache):
     """Caches items in scope of current experiment."""
+    dirname = "local_cache"
+
     @property
     def dir(self):
-        res_path = ctx.workdir / "local_cache"
+        res_path = ctx.workdir / self.dirname
         res_path.mkdir(exist_ok=True)
         return res_path
 
@@ -90,9 +134,12 @@ class CombinedCache(AbstractCache):
     def load_object(self, key):
         for cache in self.caches:
             try:
-                return cache.load_object(key)
+                obj = cache.load_object(key)
             except:
-                pass
+                continue
+            self.hits += 1
+            return obj
+        self.misses += 1
         raise KeyError(key)
 
     def save_dataframe(self, df, key):
@@ -102,9 +149,12 @@ class CombinedCache(AbstractCache):
     def load_dataframe(self, key):
         for cache in self.caches:
             try:
-                return cache.load_dataframe(key)
+                df = cache.load_dataframe(key)
             except:
-                pass
+                continue
+            self.hits += 1
+            return df
+        self.misses += 1
         raise KeyError(key)
 
 process_cache = ProcessCache()
@@ -112,3 +162,14 @@ local_cache = LocalCache()
 global_cache = GlobalCache()
 fast_local_cache = CombinedCache([process_cache, local_cache])
 fast_global_cache = CombinedCache([process_cache, global_cache])
+
+def cache_stats():
+    """Returns numbers of hits and misses of default caches in current process"""
+    caches = {
+        "process_cache": process_cache,
+        "local_cache": local_cache,
+        "global_cache": global_cache,
+        "fast_local_cache": fast_local_cache,
+        "fast_global_cache": fast_global_cache,
+    }
+    return {name: {"hits": cache.hits, "misses": cache.misses} for name, cache in caches.items()}
@@ -1,2 +1,26 @@
-from minikts.callbacks.matplotlib import MatplotlibCallback
-from minikts.callbacks.logger import LoggerCallback
+from typing import TYPE_CHECKING
+
+from minikts.lazy import lazy_exports
+
+_EXPORTS = {
+    "MetricBuffer": ("minikts.callbacks.buffer", "MetricBuffer"),
+    "load_metrics": ("minikts.callbacks.buffer", "load_metrics"),
+    "MatplotlibCallback": ("minikts.callbacks.matplotlib", "MatplotlibCallback"),
+    "LoggerCallback": ("minikts.callbacks.logger", "LoggerCallback"),
+    "for_catboost": ("minikts.callbacks.native", "for_catboost"),
+    "for_lightgbm": ("minikts.callbacks.native", "for_lightgbm"),
+    "for_xgboost": ("minikts.callbacks.native", "for_xgboost"),
+    "PruningCallback": ("minikts.callbacks.pruning", "PruningCallback"),
+    "PruningStore": ("minikts.callbacks.pruning", "PruningStore"),
+    "TrialPruned": ("minikts.callbacks.pruning", "TrialPruned"),
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(globals(), _EXPORTS)
+
+if TYPE_CHECKING:
+    from minikts.callbacks.buffer import MetricBuffer, load_metrics
+    from minikts.callbacks.matplotlib import MatplotlibCallback
+    from minikts.callbacks.logger import LoggerCallback
+    from minikts.callbacks.native import for_catboost, for_lightgbm, for_xgboost
+    from minikts.callbacks.pruning import PruningCallback, PruningStore, TrialPruned
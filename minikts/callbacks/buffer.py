@@ -0,0 +1,128 @@
+import attr
+import numpy as np
+import pandas as pd
+
+from minikts.cache import LocalCache, local_cache
+from minikts.context import ctx
+
+
+@attr.s
+class MetricBuffer:
+    """Stores training curves in growable NumPy arrays, one per key
+
+    Each record with a new step adds a row, records with the same step as the last row
+    are merged into it, records without step or with smaller steps are ignored.
+    Missing values are stored as NaN.
+
+    Args:
+        capacity: initial number of rows
+
+    Examples:
+        >>> import minikts.api as kts
+        >>> from lightgbm import LGBMClassifier
+        >>> buf = kts.MetricBuffer()
+        >>> with kts.parse_stdout(kts.patterns.lightgbm, buf, kts.MatplotlibCallback(interval=50, buffer=buf)):
+        ...     model = LGBMClassifier(n_estimators=1000)
+        ...     model.fit(x_train, y_train, eval_set=[(x_train, y_train), (x_test, y_test)])
+        >>> buf.save("curves_fold_0")
+        >>> kts.load_metrics(["MIN-15", "MIN-20"], "curves_fold_0")
+    """
+    capacity = attr.ib(default=1024, type=int)
+    _steps = attr.ib(init=False, repr=False)
+    _columns = attr.ib(factory=dict, init=False, repr=False)
+    _size = attr.ib(default=0, init=False)
+
+    def __attrs_post_init__(self):
+        self._steps = np.empty(self.capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key):
+        return self._columns[key][:self._size]
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def __call__(self, record):
+        self.append(record)
+
+    def on_batch(self, records):
+        for record in records:
+            self.append(record)
+
+    @property
+    def keys(self):
+        return list(self._columns)
+
+    @property
+    def steps(self):
+        return self._steps[:self._size]
+
+    @property
+    def last_step(self):
+        if self._size == 0:
+            return -1
+        return int(self._steps[self._size - 1])
+
+    def append(self, record):
+        step = record.get("step", None)
+        if step is None:
+            return
+        if self._size > 0 and step <= self._steps[self._size - 1]:
+            if step < self._steps[self._size - 1]:
+                return
+            row = self._size - 1
+        else:
+            if self._size == self.capacity:
+                self._grow()
+            row = self._size
+            self._steps[row] = step
+            self._size += 1
+        for key, value in record.items():
+            if key == "step":
+                continue
+            column = self._columns.get(key, None)
+            if column is None:
+                column = self._columns[key] = np.full(self.capacity, np.nan)
+            column[row] = value
+
+    def to_dataframe(self):
+        data = {"step": self.steps}
+        for key in self._columns:
+            data[key] = self[key]
+        return pd.DataFrame(data)
+
+    def save(self, key="metrics", cache=local_cache):
+        """Saves curves as a dataframe, by default to local cache of current experiment"""
+        cache.save_dataframe(self.to_dataframe(), key)
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        steps = np.empty(capacity, dtype=np.int64)
+        steps[:self._size] = self.steps
+        self._steps = steps
+        for key, column in self._columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[:self._size] = column[:self._size]
+            self._columns[key] = grown
+        self.capacity = capacity
+
+
+def load_metrics(experiment_ids, key="metrics"):
+    """Loads curves saved by MetricBuffer.save from local caches of multiple experiments
+
+    Args:
+        experiment_ids: ids of experiments, i.e. names of their directories in experiments_dir
+        key: key passed to MetricBuffer.save
+
+    Returns:
+        Dataframe with curves of all experiments and a column named "experiment"
+    """
+    frames = []
+    for experiment_id in experiment_ids:
+        path = ctx.experiments_dir / str(experiment_id) / LocalCache.dirname / (LocalCache._filter_key(key) + ".parquet")
+        frame = pd.read_parquet(path)
+        frame.insert(0, "experiment", experiment_id)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
@@ -1,24 +1,58 @@
+import time
+
 import attr
+import numpy as np
 try:
     import matplotlib.pyplot as plt
 except ImportError:
     plt = None
 try:
-    from IPython.display import clear_output
+    from IPython.display import display
 except:
-    clear_output = None
+    display = None
+
+from minikts.callbacks.buffer import MetricBuffer
 
+def _lttb(x, y, n_out):
+    """Downsamples a series to `n_out` points with Largest-Triangle-Three-Buckets algorithm"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs(
+            (x[prev] - next_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (next_y - y[prev])
+        )
+        prev = start + int(np.argmax(areas))
+        selected[i + 1] = prev
+    return x[selected], y[selected]
 
 @attr.s
 class MatplotlibCallback:
     """Plots training curves in Jupyter notebooks
 
+    The figure is created once and updated in place. Series longer than
+    `max_points` are downsampled with LTTB, which preserves their shape.
+
     Args:
         interval: update interval in steps
         figsize: figsize of plot
+        buffer: MetricBuffer storing the curves, may be shared with other callbacks
+        max_points: maximum number of points drawn per curve
+        min_period: minimum time between redraws in seconds
 
     Returns:
-        Callback redrawing training curves each `interval` steps
+        Callback redrawing training curves each `interval` steps, but not more often than each `min_period` seconds
 
     Examples:
         >>> %pylab inline
@@ -30,43 +64,66 @@ class MatplotlibCallback:
     """
     interval = attr.ib(default=5)
     figsize = attr.ib(default=(7, 5))
-    _buf = attr.ib(factory=list, init=False)
+    buffer = attr.ib(factory=MetricBuffer, repr=False)
+    max_points = attr.ib(default=1000)
+    min_period = attr.ib(default=0.5)
     _last_update = attr.ib(default=-1, init=False)
-    _last_step = attr.ib(default=-1, init=False)
-    _keys = attr.ib(factory=set, init=False)
+    _last_draw_time = attr.ib(default=float("-inf"), init=False)
+    _figure = attr.ib(default=None, init=False, repr=False)
+    _axes = attr.ib(default=None, init=False, repr=False)
+    _lines = attr.ib(factory=dict, init=False, repr=False)
+    _display_handle = attr.ib(default=None, init=False, repr=False)
     def _attrs_post_init_(self):
         if plt is None:
             raise ImportError("MatplotlibCallback is available only if matplotlib is installed. "
                               "Install it with `pip install matplotlib`.")
-        if clear_output is None:
+        if display is None:
             raise ImportError("MatplotlibCallback is available only in Jupyter environment.")
 
     def __call__(self, report):
         self.append(report)
-        if self._last_step - self._last_update >= self.interval:
+        self._maybe_draw()
+
+    def on_batch(self, reports):
+        for report in reports:
+            self.append(report)
+        self._maybe_draw()
+
+    def on_finish(self):
+        if self.buffer.last_step > self._last_update:
             self.draw()
-            self._last_update = self._last_step
-    
+
     def append(self, report):
-        step = report.get('step', -1)
-        if step <= self._last_step:
-            return
-        self._buf.append(report)
-        self._last_step = max(self._last_step, step)
-        self._keys |= set(report.keys())
-    
+        self.buffer.append(report)
+
     def draw(self):
-        plt.figure(figsize=self.figsize)
-        for key in self._keys:
-            if key == 'step':
-                continue
-            steps = list()
-            values = list()
-            for report in self._buf:
-                if "step" in report and key in report:
-                    steps.append(report["step"])
-                    values.append(report[key])
-            plt.plot(steps, values, label=key)
-        plt.legend()
-        clear_output(wait=True)
-        plt.show()
+        if self._figure is None:
+            self._figure, self._axes = plt.subplots(figsize=self.figsize)
+            plt.close(self._figure)
+            self._display_handle = display(self._figure, display_id=True)
+        steps = self.buffer.steps
+        new_lines = False
+        for key in self.buffer.keys:
+            values = self.buffer[key]
+            mask = ~np.isnan(values)
+            x, y = _lttb(steps[mask], values[mask], self.max_points)
+            line = self._lines.get(key, None)
+            if line is None:
+                self._lines[key], = self._axes.plot(x, y, label=key)
+                new_lines = True
+            else:
+                line.set_data(x, y)
+        if new_lines:
+            self._axes.legend()
+        self._axes.relim()
+        self._axes.autoscale_view()
+        self._display_handle.update(self._figure)
+        self._last_update = self.buffer.last_step
+        self._last_draw_time = time.monotonic()
+
+    def _maybe_draw(self):
+        if self.buffer.last_step - self._last_update < self.interval:
+            return
+        if time.monotonic() - self._last_draw_time < self.min_period:
+            return
+        self.draw()
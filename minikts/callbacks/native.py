@@ -0,0 +1,246 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+
+try:
+    from xgboost.callback import TrainingCallback
+except ImportError:
+    TrainingCallback = None
+
+from minikts.callbacks.pruning import pruning_requested
+
+# aliases of the LightGBM parameter enabling early stopping
+_LIGHTGBM_STOPPING_ROUNDS = ("early_stopping_round", "early_stopping_rounds", "early_stopping", "n_iter_no_change")
+
+def _last_value(values):
+    value = values[-1]
+    if isinstance(value, tuple):
+        # cv results are stored as (mean, std)
+        value = value[0]
+    return value
+
+
+class NativeAdapter:
+    """Base class of adapters passing metrics from native training callbacks to minikts callbacks
+
+    Produces the same records as `parse_stdout` does with common patterns,
+    e.g. `{"train": 0.53, "valid": 0.57, "step": 10}`, without formatting and parsing text.
+
+    Args:
+        *callbacks: callbacks to be called from each record, e.g. kts.MatplotlibCallback
+        names:
+            mapping from dataset names to record keys, if not provided,
+            the first of two datasets is reported as "train" and the second as "valid",
+            a single dataset is reported as "valid"
+        metric: name of metric to report, if not provided, the first one is used
+
+    `on_finish()` of callbacks defining it is called when training ends, or on `finish()`.
+    Adapters are also context managers calling `finish()` on exit.
+    Adapters of libraries looping in native code stop training once PruningCallback
+    has interrupted the main thread, e.g. from the thread parsing captured output.
+    """
+    def __init__(self, *callbacks, names: Optional[Dict[str, str]] = None, metric: Optional[str] = None):
+        self.callbacks = callbacks
+        self.names = names
+        self.metric = metric
+        self._pending = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+
+    def finish(self):
+        """Calls `on_finish()` of callbacks if records were emitted since the last call"""
+        if not self._pending:
+            return
+        self._pending = False
+        for callback in self.callbacks:
+            on_finish = getattr(callback, "on_finish", None)
+            if on_finish is not None:
+                on_finish()
+
+    def default_keys(self, dataset_names):
+        if len(dataset_names) == 1:
+            return ["valid"]
+        return ["train", "valid"] + dataset_names[2:]
+
+    def emit(self, step, results):
+        """Passes a record to callbacks
+
+        Args:
+            step: iteration number, as printed by the library
+            results: ordered mapping from dataset names to ordered mappings from metric names to values
+        """
+        dataset_names = list(results)
+        if self.names is not None:
+            keys = [self.names.get(name, name) for name in dataset_names]
+        else:
+            keys = self.default_keys(dataset_names)
+        record = dict()
+        for key, metrics in zip(keys, results.values()):
+            if self.metric is None:
+                if metrics:
+                    record[key] = next(iter(metrics.values()))
+            elif self.metric in metrics:
+                record[key] = metrics[self.metric]
+        record["step"] = step
+        self._pending = True
+        for callback in self.callbacks:
+            callback(record)
+
+
+class LightGBMAdapter(NativeAdapter):
+    """Adapter for LightGBM, finishes on the last iteration or the one stopping training early
+
+    lightgbm.early_stopping stops training by raising after this callback runs, so its
+    condition is evaluated here as well, with `stopping_rounds` taken from the argument or params.
+    """
+    # runs after lightgbm.print_evaluation (10) and before lightgbm.early_stopping (30)
+    order = 20
+
+    def __init__(self, *callbacks, stopping_rounds: Optional[int] = None, **kwargs):
+        super().__init__(*callbacks, **kwargs)
+        self.stopping_rounds = stopping_rounds
+        self._best = dict()
+
+    def __call__(self, env):
+        if env.iteration == env.begin_iteration:
+            # callbacks may be reused across folds
+            self.finish()
+            self._best = dict()
+        results = OrderedDict()
+        for data_name, eval_name, value, *_ in env.evaluation_result_list:
+            results.setdefault(data_name, OrderedDict())[eval_name] = value
+        self.emit(env.iteration + 1, results)
+        if env.iteration + 1 >= env.end_iteration or self._stops_early(env):
+            self.finish()
+
+    def _stops_early(self, env):
+        stopping_rounds = self.stopping_rounds
+        if stopping_rounds is None:
+            params = env.params or dict()
+            stopping_rounds = next((params[key] for key in _LIGHTGBM_STOPPING_ROUNDS if params.get(key)), None)
+        if not stopping_rounds or stopping_rounds <= 0:
+            return False
+        train_name = getattr(env.model, "_train_data_name", "training")
+        stops = False
+        for data_name, eval_name, value, higher_better, *_ in env.evaluation_result_list:
+            if data_name == train_name or (data_name == "cv_agg" and eval_name.startswith("train ")):
+                continue
+            best = self._best.get((data_name, eval_name), None)
+            if best is None or (value > best[0] if higher_better else value < best[0]):
+                self._best[(data_name, eval_name)] = best = (value, env.iteration)
+            stops = stops or env.iteration - best[1] >= stopping_rounds
+        return stops
+
+
+class CatBoostAdapter(NativeAdapter):
+    """Adapter for CatBoost
+
+    CatBoost does not tell callbacks how many iterations remain, so `on_finish()` is called
+    when the adapter starts another training, on `finish()` or on exit from a `with` block.
+    """
+    def default_keys(self, dataset_names):
+        eval_names = [name for name in dataset_names if name != "learn"]
+        eval_keys = dict(zip(eval_names, ["valid"] + eval_names[1:]))
+        return [eval_keys.get(name, "train") for name in dataset_names]
+
+    def after_iteration(self, info):
+        if info.iteration <= 1:
+            self.finish()
+        results = OrderedDict()
+        step = info.iteration - 1
+        for data_name, metrics in info.metrics.items():
+            results[data_name] = OrderedDict(
+                (metric, _last_value(values)) for metric, values in metrics.items()
+            )
+            for values in metrics.values():
+                step = len(values) - 1
+        self.emit(step, results)
+        return not pruning_requested()
+
+
+class XGBoostAdapter(NativeAdapter, TrainingCallback or object):
+    def after_iteration(self, model, epoch, evals_log):
+        results = OrderedDict(
+            (data_name, OrderedDict((metric, _last_value(values)) for metric, values in metrics.items()))
+            for data_name, metrics in evals_log.items()
+        )
+        self.emit(epoch, results)
+        return pruning_requested()
+
+    def after_training(self, model):
+        self.finish()
+        return model
+
+
+def for_lightgbm(*callbacks, names=None, metric=None, stopping_rounds=None):
+    """Creates a LightGBM callback passing evaluation results to minikts callbacks
+
+    Args:
+        *callbacks: callbacks to be called from each record, e.g. kts.MatplotlibCallback
+        names: mapping from dataset names (e.g. "valid_0") to record keys
+        metric: name of metric to report, if not provided, the first one is used
+        stopping_rounds:
+            `stopping_rounds` of lightgbm.early_stopping if it is passed as a callback,
+            so that `on_finish()` of callbacks is called on the early stopped iteration,
+            taken from `early_stopping_round` of params by default
+
+    Returns:
+        Callback compatible with `callbacks` argument of `lightgbm.train` and `LGBMModel.fit`
+
+    Examples:
+        >>> import minikts.api as kts
+        >>> from lightgbm import LGBMClassifier
+        >>> model = LGBMClassifier(n_estimators=1000)
+        >>> model.fit(x_train, y_train, eval_set=[(x_train, y_train), (x_test, y_test)],
+        ...           callbacks=[kts.callbacks.for_lightgbm(kts.MatplotlibCallback(interval=50))])
+    """
+    return LightGBMAdapter(*callbacks, names=names, metric=metric, stopping_rounds=stopping_rounds)
+
+
+def for_catboost(*callbacks, names=None, metric=None):
+    """Creates a CatBoost callback passing evaluation results to minikts callbacks
+
+    Args:
+        *callbacks: callbacks to be called from each record, e.g. kts.MatplotlibCallback
+        names: mapping from dataset names (e.g. "learn", "validation") to record keys
+        metric: name of metric to report, if not provided, the first one is used
+
+    Returns:
+        Callback compatible with `callbacks` argument of `CatBoost.fit`,
+        use it as a context manager to call `on_finish()` of callbacks after training
+
+    Examples:
+        >>> import minikts.api as kts
+        >>> from catboost import CatBoostClassifier
+        >>> model = CatBoostClassifier(n_estimators=1000)
+        >>> with kts.callbacks.for_catboost(kts.MatplotlibCallback(interval=50)) as callback:
+        ...     model.fit(x_train, y_train, eval_set=(x_test, y_test), callbacks=[callback])
+    """
+    return CatBoostAdapter(*callbacks, names=names, metric=metric)
+
+
+def for_xgboost(*callbacks, names=None, metric=None):
+    """Creates an XGBoost callback passing evaluation results to minikts callbacks
+
+    Args:
+        *callbacks: callbacks to be called from each record, e.g. kts.MatplotlibCallback
+        names: mapping from dataset names (e.g. "validation_0") to record keys
+        metric: name of metric to report, if not provided, the first one is used
+
+    Returns:
+        Instance of `xgboost.callback.TrainingCallback`
+
+    Examples:
+        >>> import minikts.api as kts
+        >>> from xgboost import XGBClassifier
+        >>> model = XGBClassifier(n_estimators=1000,
+        ...                       callbacks=[kts.callbacks.for_xgboost(kts.MatplotlibCallback(interval=50))])
+        >>> model.fit(x_train, y_train, eval_set=[(x_train, y_train), (x_test, y_test)])
+    """
+    if TrainingCallback is None:
+        raise ImportError("for_xgboost is available only if xgboost>=1.3 is installed. "
+                          "Install it with `pip install xgboost`.")
+    return XGBoostAdapter(*callbacks, names=names, metric=metric)
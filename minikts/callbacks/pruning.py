@@ -0,0 +1,211 @@
+import os
+import math
+import sqlite3
+import _thread
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+import attr
+import numpy as np
+
+from minikts.context import ctx
+from minikts.monitoring import report
+
+_interrupted_by_pruning = threading.Event()
+
+class TrialPruned(Exception):
+    """Raised by PruningCallback to stop a hopeless trial"""
+
+def consume_interrupt():
+    """Returns True if KeyboardInterrupt was sent to the main thread by PruningCallback, and resets the flag"""
+    interrupted = _interrupted_by_pruning.is_set()
+    _interrupted_by_pruning.clear()
+    return interrupted
+
+def pruning_requested():
+    """Returns True if PruningCallback has interrupted the main thread and the interrupt was not consumed yet"""
+    return _interrupted_by_pruning.is_set()
+
+@attr.s
+class PruningStore:
+    """Shares intermediate values of concurrent trials through an SQLite file
+
+    Args:
+        path: path of the database file, defaults to `pruning.sqlite` in ctx.tmp_dir
+    """
+    path = attr.ib(default=None)
+    _connection = attr.ib(default=None, init=False, repr=False)
+    _pid = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        if self.path is None:
+            self.path = ctx.tmp_dir / "pruning.sqlite"
+        self.path = Path(self.path)
+
+    @property
+    def connection(self):
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                "study TEXT, trial TEXT, step INTEGER, value REAL, PRIMARY KEY (study, trial, step))"
+            )
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def report(self, study, trial, step, value):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)", (study, trial, step, value)
+        )
+
+    def values(self, study, step, exclude_trial=None):
+        """Returns values reported at `step` by trials of the study, except `exclude_trial`"""
+        rows = self.connection.execute(
+            "SELECT value FROM reports WHERE study = ? AND step = ? AND trial != ?",
+            (study, step, exclude_trial or ""),
+        )
+        return [value for value, in rows]
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+@attr.s
+class MedianStopping:
+    """Prunes a trial whose best value is worse than the median of other trials at the same step
+
+    Args:
+        min_steps: number of steps before the first check
+        min_trials: minimum number of other trials reported at the step to make a decision
+    """
+    min_steps = attr.ib(default=10, type=int)
+    min_trials = attr.ib(default=3, type=int)
+
+    def is_check_step(self, step):
+        return step >= self.min_steps
+
+    def should_prune(self, value, other_values):
+        if len(other_values) < self.min_trials:
+            return False
+        return value < np.median(other_values)
+
+@attr.s
+class SuccessiveHalving:
+    """Keeps only top 1/eta of trials at rung steps min_steps * eta^k, asynchronously
+
+    A trial reaching a rung is compared with trials that reached it before,
+    so that no trial waits for others.
+
+    Args:
+        min_steps: step of the first rung
+        eta: reduction factor
+    """
+    min_steps = attr.ib(default=10, type=int)
+    eta = attr.ib(default=3, type=int)
+
+    def is_check_step(self, step):
+        if step < self.min_steps:
+            return False
+        rung = math.log(step / self.min_steps, self.eta)
+        return abs(rung - round(rung)) < 1e-9
+
+    def should_prune(self, value, other_values):
+        if len(other_values) + 1 < self.eta:
+            return False
+        n_kept = math.ceil((len(other_values) + 1) / self.eta)
+        return sum(other > value for other in other_values) >= n_kept
+
+_POLICIES = {"median": MedianStopping, "halving": SuccessiveHalving}
+
+class PruningCallback:
+    """Stops trials of a sweep whose validation metric is hopeless compared to concurrent trials
+
+    Best value of `key` so far is reported to a store shared by trials every `interval` steps
+    and checked against other trials with the policy. A hopeless trial is stopped by raising
+    TrialPruned, which propagates through `parse_stdout` and native callbacks into the fit call.
+    If called outside of the main thread, e.g. with `asynchronous=True` or `capture_fd=True`,
+    the main thread is interrupted instead. `kts.sweep` marks such trials as pruned.
+    The interrupt is noticed only when the main thread runs Python code, so a fit running
+    entirely in native code, e.g. CatBoost with `capture_fd=True`, goes on until it ends.
+    Pass a native adapter, e.g. `kts.callbacks.for_catboost()`, to its callbacks to stop it
+    at the next iteration.
+
+    Args:
+        trial: id of the trial
+        study: name of the group of compared trials, e.g. id of the sweep
+        key: record key of the metric
+        mode: "max" if higher values are better, "min" otherwise
+        policy: "median", "halving" or an object with `is_check_step` and `should_prune` methods
+        store: PruningStore or path of its database
+        interval: number of steps between reports
+
+    Examples:
+        >>> def train(trial):
+        ...     pruning = trial.pruning_callback(key="valid", mode="max", policy="halving")
+        ...     with kts.parse_stdout(kts.patterns.lightgbm, pruning):
+        ...         model.fit(x_train, y_train, eval_set=[(x_train, y_train), (x_test, y_test)])
+        >>> def train_catboost(trial):
+        ...     pruning = trial.pruning_callback(key="valid", mode="max")
+        ...     with kts.parse_stdout(kts.patterns.catboost, pruning, capture_fd=True):
+        ...         model.fit(x_train, y_train, eval_set=(x_test, y_test), callbacks=[kts.callbacks.for_catboost()])
+        >>> kts.sweep(train, {"lightgbm.num_leaves": [15, 31, 63, 127]})
+    """
+    def __init__(self,
+        trial: str,
+        study: str = "default",
+        key: str = "valid",
+        mode: str = "max",
+        policy: Union[str, object] = "median",
+        store: Optional[Union[PruningStore, str, Path]] = None,
+        interval: int = 1,
+    ):
+        if mode not in ("max", "min"):
+            raise ValueError(f"Unknown mode {mode}, expected max or min")
+        self.trial = trial
+        self.study = study
+        self.key = key
+        self.sign = 1 if mode == "max" else -1
+        self.policy = _POLICIES[policy]() if isinstance(policy, str) else policy
+        self.store = store if isinstance(store, PruningStore) else PruningStore(store)
+        self.interval = interval
+        self.best = -math.inf
+        self.n_records = 0
+        self.pruned_at = None
+
+    def __call__(self, record):
+        if self.pruned_at is not None:
+            self._stop()
+        value = record.get(self.key, None)
+        if value is None:
+            return
+        self.n_records += 1
+        step = record.get("step", self.n_records)
+        self.best = max(self.best, self.sign * value)
+        if step % self.interval:
+            return
+        self.store.report(self.study, self.trial, step, self.best)
+        if not self.policy.is_check_step(step):
+            return
+        other_values = self.store.values(self.study, step, exclude_trial=self.trial)
+        if self.policy.should_prune(self.best, other_values):
+            self.pruned_at = step
+            report("sweep", f"Pruned trial [!path]{self.trial}[/] at step [!number]{step}[/], "
+                            f"best {self.key} [!number]{self.sign * self.best:.5g}[/]")
+            self._stop()
+
+    def on_batch(self, records):
+        for record in records:
+            self(record)
+
+    def _stop(self):
+        if threading.current_thread() is not threading.main_thread():
+            if not _interrupted_by_pruning.is_set():
+                _interrupted_by_pruning.set()
+                _thread.interrupt_main()
+            return
+        raise TrialPruned(f"Trial {self.trial} pruned at step {self.pruned_at}")
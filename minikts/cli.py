@@ -1,4 +1,5 @@
 import abc
+import sys
 import click
 import functools
 
@@ -10,14 +11,17 @@ class CLIMeta(abc.ABCMeta):
         for base in bases:
             if hasattr(base, "__click_params__"):
                 click_params.update(base.__click_params__)
-        for name, member in members.items():
+        for member_name, member in members.items():
             if hasattr(member, "__click_params__"):
-                click_params[name] = member.__click_params__
+                click_params[member_name] = member.__click_params__
         return abc.ABCMeta.__new__(cls, name, bases, members)
     
-def wrap(method, click_params):
+def wrap(method, click_params, options=None):
     @functools.wraps(method)
     def wrapped(*args, **kwargs):
+        if options is not None and options.dry_run and not hasattr(method, "__step__"):
+            options.plan.append({"step": method.__name__, "action": "run", "fingerprint": "-", "reason": "not a step"})
+            return None
         return method(*args, **kwargs)
     setattr(wrapped, "__click_params__", click_params)
     return wrapped
@@ -46,18 +50,62 @@ class CLI(metaclass=CLIMeta):
         ...         ...
         >>> if __name__ == "__main__":
         ...     Runner().run()
+
+        Commands can be sent to a warm daemon process, which keeps imports,
+        `process_cache` and loaded data between invocations:
+
+        $ python main.py --daemon train test
+        $ python -m minikts.daemon main.py train test  # thin client, skips imports of main.py
+        $ python main.py --daemon-stop
+
+        Commands decorated with `kts.step` are skipped when their inputs are unchanged:
+
+        $ python main.py --dry-run train test  # print the plan
+        $ python main.py --force train test  # run everything
     """
-    def run(self, **kwargs):
-        @click.group(chain=True)
-        def _cli():
-            pass
-        
-        for name, params in self.__click_params__.items():
-            method = getattr(self, name)
-            wrapped = wrap(method, params)
-            _cli.command(name)(wrapped)
-            
-        _cli(standalone_mode=False, **kwargs)
+    def run(self, daemon=False, **kwargs):
+        """Runs commands from command line
+
+        Args:
+            daemon: if set to True, commands are sent to the daemon unless `--no-daemon` is passed
+        """
+        args = list(kwargs.pop("args", sys.argv[1:]))
+        flag = args[0] if args else None
+        if flag in ("--daemon", "--daemon-stop", "--daemon-serve", "--no-daemon"):
+            args = args[1:]
+        elif daemon:
+            flag = "--daemon"
+        if flag in ("--daemon", "--daemon-stop"):
+            from minikts.daemon import run_client
+            sys.exit(run_client(self._script_path(), args, stop=flag == "--daemon-stop"))
+        if flag == "--daemon-serve":
+            from minikts.daemon import serve
+            serve(self, self._script_path(), lambda cli, args: cli._run_commands(args))
+            return
+        self._run_commands(args, **kwargs)
+
+    def _run_commands(self, args, **kwargs):
+        from minikts.steps import run_options, report_plan
+
+        with run_options() as options:
+            @click.group(chain=True)
+            @click.option("--force", is_flag=True, help="Run steps even if their inputs are unchanged")
+            @click.option("--dry-run", is_flag=True, help="Print which steps would run, without running them")
+            def _cli(force, dry_run):
+                options.force = force
+                options.dry_run = dry_run
+
+            for name, params in self.__click_params__.items():
+                method = getattr(self, name)
+                wrapped = wrap(method, params, options)
+                _cli.command(name)(wrapped)
+
+            _cli(args=args, standalone_mode=False, **kwargs)
+            if options.dry_run:
+                report_plan(options.plan)
+
+    def _script_path(self):
+        return ctx.script_path or sys.modules[type(self).__module__].__file__
 
 def config_option(arg_name="config_path"):
     result = click.option(
@@ -73,3 +121,14 @@ def config_option(arg_name="config_path"):
         ),
     )
     return result
+
+def overrides_option(arg_name="overrides"):
+    """Adds repeatable `--set key.subkey=value` option, to be passed to `load_config(..., overrides=...)`"""
+    result = click.option(
+        "--set",
+        arg_name,
+        multiple=True,
+        metavar="KEY=VALUE",
+        help="Override config value, e.g. --set hparams.catboost.iterations=100",
+    )
+    return result
@@ -1,38 +1,233 @@
 import os
 import sys
+import pickle
+import hashlib
+import threading
+from collections.abc import Mapping
 from functools import partial
 from pathlib import Path
+from typing import List, Optional
 
 from box import Box
 from box.converters import yaml
 
+from minikts.context import ctx
 from minikts.monitoring import report, shorten_path
 
+_parse_state = threading.local()
+
 def _join_path(loader, node):
     seq = loader.construct_sequence(node)
     return Path().joinpath(*seq)
 
 def _get_from_env(loader, node):
-    return os.environ.get(node.value, None)
+    value = os.environ.get(node.value, None)
+    _parse_state.dependencies.append(("env", node.value, value))
+    return value
+
+def _include(loader, node):
+    path = Path(loader.construct_scalar(node)).expanduser()
+    if not path.is_absolute():
+        path = _parse_state.includes[-1].parent / path
+    return _parse_file(path.resolve())
 
 yaml.SafeLoader.add_constructor('!join_path', _join_path)
 yaml.SafeLoader.add_constructor('!env', _get_from_env)
+yaml.SafeLoader.add_constructor('!include', _include)
+
+def _parse_file(path, content=None):
+    if path in _parse_state.includes:
+        raise ConfigError(f"Circular !include of {path}")
+    if content is None:
+        content = path.read_bytes()
+        _parse_state.dependencies.append(("file", str(path), hashlib.sha256(content).hexdigest()))
+    _parse_state.includes.append(path)
+    try:
+        return yaml.load(content, Loader=yaml.SafeLoader) or dict()
+    finally:
+        _parse_state.includes.pop()
+
+def _dependencies_changed(dependencies):
+    for kind, name, value in dependencies:
+        if kind == "env" and os.environ.get(name, None) != value:
+            return True
+        if kind == "file":
+            try:
+                if hashlib.sha256(Path(name).read_bytes()).hexdigest() != value:
+                    return True
+            except OSError:
+                return True
+    return False
+
+def _parse_config(path):
+    """Parses YAML config, reusing the result cached in ctx.tmp_dir if the file, its includes and used env variables are unchanged"""
+    content = path.read_bytes()
+    cache_path = None
+    if ctx.root_dir is not None:
+        key = hashlib.sha256(content + b"\0" + str(path.parent).encode()).hexdigest()
+        cache_path = ctx.tmp_dir / "configs" / f"{key}.pickle"
+        try:
+            with open(cache_path, "rb") as f:
+                dependencies, data = pickle.load(f)
+            if not _dependencies_changed(dependencies):
+                return data, True
+        except Exception:
+            pass
+    _parse_state.dependencies = list()
+    _parse_state.includes = list()
+    data = _parse_file(path, content)
+    if cache_path is not None:
+        cache_path.parent.mkdir(exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((_parse_state.dependencies, data), f)
+        os.replace(tmp_path, cache_path)
+    return data, False
+
+def _apply_override(data, override):
+    key, sep, raw_value = override.partition("=")
+    if not sep or not key:
+        raise ConfigError(f"Invalid override {override!r}, expected key.subkey=value")
+    *parents, last = key.strip().split(".")
+    node = data
+    for parent in parents:
+        node = node.setdefault(parent, dict())
+        if not isinstance(node, dict):
+            raise ConfigError(f"Cannot override {key}, {parent} is not a mapping")
+    _parse_state.dependencies = list()
+    _parse_state.includes = [Path.cwd() / "<override>"]
+    node[last] = yaml.load(raw_value, Loader=yaml.SafeLoader)
 
 _CONFIG_FILENAME = None
 _CONFIG_POSTLOAD_HOOKS = []
 
-config = Box(box_dots=True)
-hparams = Box(box_dots=True)
+_MISSING = object()
+
+def _freeze_value(value):
+    if isinstance(value, dict):
+        return FrozenConfig(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(map(_freeze_value, value))
+    return value
+
+def _unfreeze_value(value):
+    if isinstance(value, FrozenConfig):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return list(map(_unfreeze_value, value))
+    return value
+
+class FrozenConfig(Mapping):
+    """Immutable snapshot of a config with the same read API as Box
+
+    Values are stored in the `_values` slot, and keys which are valid attribute names
+    are mirrored into the instance `__dict__`, so attribute access is as cheap
+    as for a plain object, dotted keys are resolved with a precomputed dict.
+    Nested dicts become FrozenConfig and lists become tuples.
+    Keys colliding with attributes of the class, e.g. `items`, are only accessible with `[]`.
+
+    Examples:
+        >>> params = hparams.freeze()
+        >>> for row in rows:
+        ...     weight = params.model.weight
+        >>> params["model.weight"]
+    """
+    __slots__ = ("__dict__", "_values", "_dotted")
+
+    def __init__(self, data):
+        values = {key: _freeze_value(value) for key, value in data.items()}
+        dotted = dict()
+        for key, value in values.items():
+            if isinstance(value, FrozenConfig):
+                for subkey, subvalue in (*value._values.items(), *value._dotted.items()):
+                    dotted[f"{key}.{subkey}"] = subvalue
+        attributes = {
+            key: value for key, value in values.items()
+            if isinstance(key, str) and key.isidentifier() and not hasattr(FrozenConfig, key)
+        }
+        object.__setattr__(self, "__dict__", attributes)
+        object.__setattr__(self, "_values", values)
+        object.__setattr__(self, "_dotted", dotted)
+
+    def __getitem__(self, key):
+        value = self._values.get(key, _MISSING)
+        if value is _MISSING:
+            return self._dotted[key]
+        return value
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values or key in self._dotted
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"Cannot set {key}, {type(self).__name__} is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"Cannot delete {key}, {type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return FrozenConfig, (self.to_dict(),)
+
+    def __hash__(self):
+        return hash(tuple(self._values.items()))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {key: _unfreeze_value(value) for key, value in self._values.items()}
+
+class Config(Box):
+    def freeze(self):
+        """Returns an immutable snapshot for fast access in hot loops and cheap pickling into workers"""
+        return FrozenConfig(self.to_dict())
+
+config = Config(box_dots=True)
+hparams = Config(box_dots=True)
+
+def _read_config(filename, overrides):
+    global _CONFIG_FILENAME
+    _CONFIG_FILENAME = filename
+    data, cached = _parse_config(Path(filename).expanduser().resolve())
+    for override in overrides or []:
+        _apply_override(data, override)
+    _CONFIG_FILENAME = None
+    return data, cached
+
+def read_config(filename, overrides: Optional[List[str]] = None):
+    """Returns contents of a config as a dict with overrides applied, without loading it into `config`"""
+    data, _ = _read_config(filename, overrides)
+    return data
+
+def load_config(filename, postload_hooks=True, overrides: Optional[List[str]] = None):
+    """Loads YAML config into `config` and its `hparams` section into `hparams`
+
+    Parsed configs are cached in ctx.tmp_dir by content, so that repeated runs skip
+    parsing. Besides `!join_path` and `!env`, `!include path.yaml` inserts contents
+    of another file, relative paths are resolved from the including file.
+
+    Args:
+        filename: path of the config
+        postload_hooks: if set to False, postload hooks are not called
+        overrides: values replacing ones from the file, formatted as `key.subkey=value`,
+            values are parsed as YAML
 
-def load_config(filename, postload_hooks=True):
+    Examples:
+        >>> kts.load_config("config.yaml", overrides=["hparams.catboost.depth=8"])
+    """
     global _CONFIG_FILENAME
+    data, cached = _read_config(filename, overrides)
     _CONFIG_FILENAME = filename
-    loaded_config = Box.from_yaml(
-        filename=filename, 
-        box_dots=True,
-        Loader=yaml.SafeLoader
-    )
-    report("config", f"Loaded config from [!path]{shorten_path(filename)}[/]")
+    loaded_config = Box(data, box_dots=True)
+    cached_note = " (cached)" if cached else ""
+    report("config", f"Loaded config from [!path]{shorten_path(filename)}[/]{cached_note}")
+    for override in overrides or []:
+        report("config", f"Override [!path]{override}[/]")
 
     config.merge_update(loaded_config)
     if "hparams" in loaded_config:
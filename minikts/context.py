@@ -6,6 +6,7 @@ import shutil
 from pathlib import Path
 from typing import Optional, Union, List
 
+from minikts.blobs import BlobStore
 from minikts.monitoring import report, shorten_path
 
 @attr.s
@@ -48,6 +49,10 @@ class Context:
         result.mkdir(exist_ok=True)
         return result
     
+    @property
+    def blob_store(self):
+        return BlobStore(self.tmp_dir / "blobs")
+    
     @property
     def is_inside_experiment(self):
         if self.script_path is None:
@@ -68,6 +73,11 @@ class Context:
         src_dir: Optional[Union[str, Path]] = None, 
         dest_dir: Optional[Union[str, Path]] = None, 
     ):
+        """Copies tracked files into `dest_dir`
+
+        Sources are copied rather than hardlinked to the blob store, so that editing them
+        in one experiment does not change others. They are small, so the copies are not deduplicated.
+        """
         filenames = filenames or self.tracked_filenames
         src_dir = src_dir or self.src_dir
         dest_dir = dest_dir or self.workdir
@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import array
+import runpy
+import socket
+import hashlib
+import tempfile
+import traceback
+import subprocess
+from pathlib import Path
+
+# the client side imports only stdlib to start fast, server side dependencies are imported in `serve`
+
+_CONNECT_TIMEOUT = 60
+
+def _runtime_dir():
+    """Returns a directory only the user can access: $XDG_RUNTIME_DIR or a 0700 directory in tmp"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", None)
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return Path(runtime_dir)
+    path = Path(tempfile.gettempdir()) / f"minikts-{os.getuid()}"
+    try:
+        path.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    stat = path.lstat()
+    if not path.is_dir() or path.is_symlink() or stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by the user with mode 0700")
+    return path
+
+def socket_path(script_path):
+    """Returns path of the socket of the daemon serving `script_path`"""
+    digest = hashlib.sha256(str(Path(script_path).resolve()).encode()).hexdigest()[:12]
+    return _runtime_dir() / f"minikts-{digest}.sock"
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+def _spawn(script_path, path):
+    log_path = path.with_suffix(".log")
+    print(f"Starting daemon for {script_path}, log: {log_path}", file=sys.stderr)
+    with open(log_path, "ab") as log:
+        subprocess.Popen(
+            [sys.executable, str(script_path), "--daemon-serve"],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    deadline = time.monotonic() + _CONNECT_TIMEOUT
+    while time.monotonic() < deadline:
+        sock = _connect(path)
+        if sock is not None:
+            return sock
+        time.sleep(0.05)
+    raise TimeoutError(f"Daemon did not start in {_CONNECT_TIMEOUT}s, see {log_path}")
+
+def _send_fds(sock, data, fds):
+    # socket.send_fds and socket.recv_fds appeared only in Python 3.9
+    sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))])
+
+def _recv_fds(sock, bufsize, max_fds):
+    fds = array.array("i")
+    message, ancdata, _, _ = sock.recvmsg(bufsize, socket.CMSG_LEN(max_fds * fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+    return message, list(fds)
+
+def _recv_line(sock):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def run_client(script_path, args, stop=False):
+    """Sends command line arguments to the daemon, starting it if needed
+
+    The daemon receives stdin, stdout and stderr of the client, so output goes
+    straight to the client terminal, and runs commands in the client environment.
+
+    Returns:
+        Exit code of the commands
+    """
+    path = socket_path(script_path)
+    sock = _connect(path)
+    if sock is None:
+        if stop:
+            return 0
+        sock = _spawn(script_path, path)
+    with sock:
+        request = {"args": list(args), "cwd": os.getcwd(), "env": dict(os.environ), "stop": stop}
+        sys.stdout.flush()
+        sys.stderr.flush()
+        _send_fds(sock, json.dumps(request).encode() + b"\n", [0, 1, 2])
+        response = _recv_line(sock)
+    if not response:
+        print(f"Daemon died while running commands, see {path.with_suffix('.log')}", file=sys.stderr)
+        return 1
+    return json.loads(response)["exit_code"]
+
+def _user_modules(root):
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if not filename or name in ("__main__", "__mp_main__") or name.split(".")[0] == "minikts" or "site-packages" in filename:
+            continue
+        try:
+            Path(filename).resolve().relative_to(root)
+        except ValueError:
+            continue
+        yield name, Path(filename)
+
+def _source_digest(script_path):
+    from minikts.blobs import hash_file
+    root = script_path.parent
+    paths = [script_path] + sorted(path for _, path in _user_modules(root))
+    return [(str(path), hash_file(path)) for path in paths if path.exists()]
+
+def _reload(script_path, class_name):
+    for name, _ in list(_user_modules(script_path.parent)):
+        del sys.modules[name]
+    namespace = runpy.run_path(str(script_path), run_name="__minikts_daemon__")
+    return namespace[class_name]()
+
+def _run_request(request, fds, action):
+    import click
+    from minikts.config import config, hparams
+    saved_fds = [os.dup(fd) for fd in (0, 1, 2)]
+    saved_env = dict(os.environ)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for fd, client_fd in zip((0, 1, 2), fds):
+        os.dup2(client_fd, fd)
+    try:
+        os.chdir(request["cwd"])
+        # e.g. CUDA_VISIBLE_DEVICES or API tokens of loggers may differ between clients
+        os.environ.clear()
+        os.environ.update(request["env"])
+        config.clear()
+        hparams.clear()
+        action(request["args"])
+        exit_code = 0
+    except click.ClickException as e:
+        e.show()
+        exit_code = e.exit_code
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.environ.clear()
+        os.environ.update(saved_env)
+        for fd, saved_fd in zip((0, 1, 2), saved_fds):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
+        for client_fd in fds:
+            os.close(client_fd)
+    return exit_code
+
+def serve(cli, script_path, run_commands):
+    """Runs commands sent by clients one at a time, keeping imports and process_cache warm
+
+    User modules located next to the script are reloaded when hashes of their sources change.
+    """
+    from minikts.monitoring import report, shorten_path
+    script_path = Path(script_path).resolve()
+    path = socket_path(script_path)
+    if path.exists():
+        path.unlink()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen()
+    report("daemon", f"Serving [!path]{shorten_path(script_path)}[/] at [!path]{shorten_path(path)}[/]")
+    state = {"cli": cli, "digest": _source_digest(script_path)}
+
+    def action(args):
+        if _source_digest(script_path) != state["digest"]:
+            report("daemon", "Sources changed, reloading")
+            state["cli"] = _reload(script_path, type(state["cli"]).__name__)
+            state["digest"] = _source_digest(script_path)
+        run_commands(state["cli"], args)
+
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                message, fds = _recv_fds(connection, 1 << 16, 3)
+                if not message.endswith(b"\n"):
+                    # the environment may not fit into the first chunk
+                    message += _recv_line(connection)
+                request = json.loads(message)
+                if request["stop"]:
+                    for fd in fds:
+                        os.close(fd)
+                    connection.sendall(json.dumps({"exit_code": 0}).encode() + b"\n")
+                    report("daemon", "Stopped")
+                    return
+                exit_code = _run_request(request, fds, action)
+                connection.sendall(json.dumps({"exit_code": exit_code}).encode() + b"\n")
+    finally:
+        server.close()
+        if path.exists():
+            path.unlink()
+
+if __name__ == "__main__":
+    # thin client: python -m minikts.daemon [--stop] main.py [COMMANDS...]
+    client_args = sys.argv[1:]
+    stop = bool(client_args) and client_args[0] == "--stop"
+    if stop:
+        client_args = client_args[1:]
+    if not client_args:
+        sys.exit("Usage: python -m minikts.daemon [--stop] SCRIPT [COMMANDS...]")
+    sys.exit(run_client(Path(client_args[0]).resolve(), client_args[1:], stop=stop))
@@ -0,0 +1,35 @@
+import sys
+import importlib
+
+def lazy_exports(module_globals, exports):
+    """Makes a module resolve its exports on first access
+
+    Args:
+        module_globals: `globals()` of the module
+        exports: dict mapping exported names to (module name, attribute name) pairs,
+            attribute name is None for exported modules
+
+    Module `__getattr__` needs Python 3.7, on older versions the exports are imported eagerly.
+
+    Returns:
+        `__getattr__` and `__dir__` functions to be set in the module
+
+    Examples:
+        >>> __getattr__, __dir__ = lazy_exports(globals(), {"config": ("minikts.config", "config")})
+    """
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module {module_globals['__name__']!r} has no attribute {name!r}")
+        module_name, attr_name = exports[name]
+        module = importlib.import_module(module_name)
+        value = module if attr_name is None else getattr(module, attr_name)
+        module_globals[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(module_globals) | set(exports))
+
+    if sys.version_info < (3, 7):
+        for name in exports:
+            __getattr__(name)
+    return __getattr__, __dir__
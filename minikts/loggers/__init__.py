@@ -1 +1,17 @@
-from minikts.loggers.neptune import NeptuneLogger
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from minikts.lazy import lazy_exports
+
+_EXPORTS = {
+    "NeptuneLogger": ("minikts.loggers.neptune", "NeptuneLogger"),
+    "LocalLogger": ("minikts.loggers.local", "LocalLogger"),
+    "leaderboard": ("minikts.loggers.local", "leaderboard"),
+    "query_metrics": ("minikts.loggers.local", "query_metrics"),
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(globals(), _EXPORTS)
+
+if TYPE_CHECKING:
+    from minikts.loggers.neptune import NeptuneLogger
+    from minikts.loggers.local import LocalLogger, leaderboard, query_metrics
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import atexit
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow.dataset as ds
+except ImportError:
+    ds = None
+
+from minikts.config import hparams
+from minikts.context import ctx
+from minikts.monitoring import report
+from minikts.utils import _flatten_box, find_next_of_format
+
+_METRICS_DIRNAME = "metrics"
+_SEGMENT_FORMAT = "segment-{:06d}.parquet"
+
+class LocalLogger:
+    """Logs experiments to experiments_dir without any external service
+
+    Has the same interface as NeptuneLogger. Experiment ids are allocated as
+    `{prefix}-{number}`, each experiment gets a directory in experiments_dir.
+    Metrics are buffered and written to append-only Parquet segments, which can
+    be loaded for many experiments at once with `query_metrics` and `leaderboard`.
+
+    Args:
+        prefix: prefix of experiment ids
+        tags: tags of experiment
+        verbose: if set to True, reports each logged value
+        create_workdir: if set to True, switches workdir to the experiment directory
+        segment_size: number of metric values buffered before a segment is written
+
+    Examples:
+        >>> logger = kts.LocalLogger(tags=["catboost"])
+        >>> logger.log_metric("ROC", fold_idx, score)
+        >>> kts.leaderboard("ROC", mode="mean")
+    """
+    def __init__(self,
+        prefix: str = "LOC",
+        tags: Optional[List[str]] = None,
+        verbose: bool = False,
+        create_workdir: bool = True,
+        segment_size: int = 10000,
+    ):
+        self.prefix = prefix
+        self.tags = tags
+        self.verbose = verbose
+        self.create_workdir = create_workdir
+        self.segment_size = segment_size
+        self._rows = []
+        self._counters = dict()
+        self._n_segments = 0
+        self._lock = threading.Lock()
+        self.create_experiment()
+        atexit.register(self.close)
+
+    @property
+    def id(self):
+        return self.experiment_dir.name
+
+    def log_metric(self, log_name, x, y=None, timestamp=None):
+        if self.verbose:
+            report("logger", f"log_metric({log_name}, {x}, {y})")
+        x, y = self._step_and_value(log_name, x, y)
+        with self._lock:
+            self._rows.append((log_name, x, y, timestamp or time.time()))
+            if len(self._rows) >= self.segment_size:
+                self._write_segment()
+
+    def log_text(self, log_name, x, y=None, timestamp=None):
+        if self.verbose:
+            report("logger", f"log_text({log_name}, {x}, {y})")
+        x, y = self._step_and_value(log_name, x, y)
+        record = {"name": log_name, "x": x, "y": y, "timestamp": timestamp or time.time()}
+        with open(self.experiment_dir / "text.jsonl", "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def log_image(self, log_name, x, y=None, image_name=None, description=None, timestamp=None):
+        if self.verbose:
+            x_shape = x.shape if hasattr(x, 'shape') else None
+            y_shape = y.shape if hasattr(y, 'shape') else None
+            report("logger", f"log_image({log_name}, {x_shape}, {y_shape})")
+        x, image = self._step_and_value(log_name, x, y)
+        image_dir = self.experiment_dir / "images" / log_name
+        image_dir.mkdir(parents=True, exist_ok=True)
+        path = image_dir / f"{image_name or x}.png"
+        if hasattr(image, "savefig"):
+            image.savefig(path)
+        elif hasattr(image, "save"):
+            image.save(path)
+        else:
+            import matplotlib.image
+            matplotlib.image.imsave(path, np.asarray(image))
+
+    def log_artifact(self, artifact, destination=None):
+        if self.verbose:
+            report("logger", "log_artifact()")
+        dest_file = self.experiment_dir / "artifacts" / (destination or Path(artifact).name)
+        dest_file.parent.mkdir(parents=True, exist_ok=True)
+        ctx.blob_store.checkout(artifact, dest_file)
+
+    def flush(self):
+        """Writes buffered metrics to a new segment"""
+        with self._lock:
+            self._write_segment()
+
+    def close(self):
+        self.flush()
+
+    def create_experiment(self):
+        experiments_dir = ctx.experiments_dir
+        if experiments_dir is None:
+            raise OSError("Experiments directory does not exist. Use minikts.init(root_dir=...) to set it.")
+        while True:
+            experiment_dir = find_next_of_format(f"{self.prefix}-{{:d}}", parent_dir=experiments_dir)
+            try:
+                experiment_dir.mkdir()
+                break
+            except FileExistsError:
+                continue
+        self.experiment_dir = experiment_dir
+        (experiment_dir / _METRICS_DIRNAME).mkdir()
+        meta = {
+            "id": self.id,
+            "tags": list(self.tags or []),
+            "created": time.time(),
+            "params": {key: _to_json(value) for key, value in _flatten_box(hparams).items()},
+        }
+        with open(experiment_dir / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+        report("logger", f"Created experiment [!path]{self.id}[/]")
+        if self.create_workdir:
+            ctx.switch_workdir(experiment_dir)
+
+    def _step_and_value(self, log_name, x, y):
+        if y is not None:
+            self._counters[log_name] = x + 1
+            return x, y
+        step = self._counters.get(log_name, 0)
+        self._counters[log_name] = step + 1
+        return step, x
+
+    def _write_segment(self):
+        if not self._rows:
+            return
+        names, xs, ys, timestamps = zip(*self._rows)
+        self._rows = []
+        segment = pd.DataFrame({
+            "experiment": pd.Categorical([self.id] * len(names)),
+            "name": pd.Categorical(names),
+            "x": np.asarray(xs, dtype=np.float64),
+            "y": np.asarray(ys, dtype=np.float64),
+            "timestamp": np.asarray(timestamps, dtype=np.float64),
+        })
+        metrics_dir = self.experiment_dir / _METRICS_DIRNAME
+        while (metrics_dir / _SEGMENT_FORMAT.format(self._n_segments)).exists():
+            self._n_segments += 1
+        path = metrics_dir / _SEGMENT_FORMAT.format(self._n_segments)
+        tmp_path = path.with_suffix(".tmp")
+        segment.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self._n_segments += 1
+
+def _to_json(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+def _segment_paths(experiment_ids=None):
+    experiments_dir = ctx.experiments_dir
+    if experiment_ids is None:
+        return sorted(map(str, experiments_dir.glob(f"*/{_METRICS_DIRNAME}/*.parquet")))
+    paths = []
+    for experiment_id in experiment_ids:
+        paths += sorted(map(str, (experiments_dir / str(experiment_id) / _METRICS_DIRNAME).glob("*.parquet")))
+    return paths
+
+def query_metrics(names=None, experiment_ids=None):
+    """Loads metrics logged by LocalLogger in a single read
+
+    Args:
+        names: names of metrics to load, all if not provided
+        experiment_ids: ids of experiments, all in experiments_dir if not provided
+
+    Returns:
+        Dataframe with columns experiment, name, x, y, timestamp
+    """
+    if ds is None:
+        raise ImportError("query_metrics is available only if pyarrow is installed. "
+                          "Install it with `pip install pyarrow`.")
+    paths = _segment_paths(experiment_ids)
+    columns = ["experiment", "name", "x", "y", "timestamp"]
+    if not paths:
+        return pd.DataFrame(columns=columns)
+    dataset = ds.dataset(paths, format="parquet")
+    row_filter = None
+    if names is not None:
+        row_filter = ds.field("name").isin(list(names))
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+def leaderboard(name, mode="last", experiment_ids=None, ascending=False):
+    """Ranks experiments by a metric logged by LocalLogger
+
+    Args:
+        name: metric name
+        mode: aggregation of metric values within experiment, e.g. "last", "max", "min", "mean"
+        experiment_ids: ids of experiments, all in experiments_dir if not provided
+        ascending: sort order
+
+    Returns:
+        Dataframe indexed by experiment id
+    """
+    metrics = query_metrics([name], experiment_ids)
+    metrics = metrics.sort_values(["experiment", "x"], kind="stable")
+    result = metrics.groupby("experiment", observed=True)["y"].agg(mode).rename(name).to_frame()
+    result["n_values"] = metrics.groupby("experiment", observed=True).size()
+    return result.sort_values(name, ascending=ascending)
@@ -1,3 +1,6 @@
+import time
+import atexit
+from pathlib import Path
 from typing import Optional
 
 try:
@@ -9,8 +12,27 @@ from minikts.config import config, hparams
 from minikts.utils import _flatten_box
 from minikts.context import ctx
 from minikts.monitoring import report
+from minikts.loggers.sender import BackgroundSender, read_spool
 
 class NeptuneLogger:
+    """Logs experiments to Neptune
+
+    By default values are sent from a background thread, so logging never blocks
+    the training loop. If Neptune is slow or unreachable, values are spooled to
+    `spool_path` and replayed later.
+
+    Args:
+        api_token: Neptune API token
+        project_name: qualified name of Neptune project
+        tags: tags of experiment
+        verbose: if set to True, reports each logged value
+        dry_run: if set to True, uses offline backend of Neptune
+        create_workdir: if set to True, switches workdir to experiments_dir/{id}
+        background: if set to True, values are sent from a background thread
+        spool_path: path of spool file, by default neptune.spool in workdir
+        close_timeout: time in seconds to wait for pending values at exit
+        **kwargs: passed to neptune.create_experiment
+    """
     def __init__(self, 
         api_token: Optional[str] = None,
         project_name: Optional[str] = None, 
@@ -18,6 +40,9 @@ class NeptuneLogger:
         verbose: bool = False,
         dry_run: bool = False,
         create_workdir: bool = True,
+        background: bool = True,
+        spool_path: Optional[str] = None,
+        close_timeout: float = 30.0,
         **kwargs,
     ):
         self.api_token = api_token
@@ -26,8 +51,13 @@ class NeptuneLogger:
         self.verbose = verbose
         self.dry_run = dry_run
         self.create_workdir = create_workdir
+        self.close_timeout = close_timeout
         self.kwargs = kwargs
         self.create_experiment()
+        self.sender = None
+        if background:
+            self.sender = BackgroundSender(self._deliver, spool_path or ctx.workdir / "neptune.spool").start()
+            atexit.register(self.close)
 
     @property
     def id(self):
@@ -38,24 +68,79 @@ class NeptuneLogger:
     def log_metric(self, log_name, x, y=None, timestamp=None):
         if self.verbose:
             report("logger", f"log_metric({log_name}, {x}, {y})")
-        self.experiment.log_metric(log_name, x, y, timestamp)
+        self._send("metric", log_name, x, y, timestamp or time.time())
 
     def log_text(self, log_name, x, y=None, timestamp=None):
         if self.verbose:
             report("logger", f"log_text({log_name}, {x}, {y})")
-        self.experiment.log_text(log_name, x, y, timestamp)
+        self._send("text", log_name, x, y, timestamp or time.time())
 
     def log_image(self, log_name, x, y=None, image_name=None, description=None, timestamp=None):
+        """Logs an image, in background mode the image must not be modified after this call"""
         if self.verbose:
             x_shape = x.shape if hasattr(x, 'shape') else None
             y_shape = y.shape if hasattr(y, 'shape') else None
             report("logger", f"log_image({log_name}, {x_shape}, {y_shape})")
-        self.experiment.log_image(log_name, x, y, image_name, description, timestamp)
+        self._send("image", log_name, x, y, image_name, description, timestamp or time.time())
 
     def log_artifact(self, artifact, destination=None):
+        """Logs a file, uploading it only if its contents were not uploaded before
+
+        The file is snapshotted to the blob store, so it may be modified right after this call.
+        Files uploaded with earlier experiments are referenced by digest in experiment properties.
+        """
         if self.verbose:
             report("logger", f"log_artifact()")
-        self.experiment.log_artifact(artifact, destination)
+        digest = ctx.blob_store.put(artifact)
+        self._send("artifact", digest, destination or Path(artifact).name)
+
+    def flush(self, timeout=None):
+        """Waits until all logged values are sent or spooled"""
+        if self.sender is not None:
+            return self.sender.flush(timeout)
+        return True
+
+    def replay(self, spool_path=None):
+        """Sends values spooled to `spool_path` to current experiment
+
+        If `spool_path` is not provided, retries sending values spooled by this logger.
+        """
+        if spool_path is None:
+            if self.sender is not None:
+                self.sender.replay()
+            return
+        for kind, name, args in read_spool(spool_path):
+            self._send(kind, name, *args)
+
+    def close(self):
+        """Sends pending values and stops the background thread"""
+        if self.sender is not None:
+            self.sender.close(self.close_timeout)
+
+    def _send(self, kind, name, *args):
+        if self.sender is not None:
+            self.sender.send(kind, name, *args)
+        else:
+            self._deliver(kind, name, [args])
+
+    def _deliver(self, kind, name, points):
+        if kind == "artifact":
+            for destination, in points:
+                self._upload_artifact(name, destination)
+            return
+        method = getattr(self.experiment, f"log_{kind}")
+        for args in points:
+            method(name, *args)
+
+    def _upload_artifact(self, digest, destination):
+        blob_store = ctx.blob_store
+        uploaded_with = blob_store.get_upload(digest, "neptune")
+        if uploaded_with is None:
+            self.experiment.log_artifact(str(blob_store.path(digest)), destination)
+            if not self.dry_run:
+                blob_store.set_upload(digest, "neptune", self.id)
+        else:
+            self.experiment.set_property(f"artifact:{destination}", f"sha256:{digest}@{uploaded_with}")
 
     def create_experiment(self):
         if self.dry_run:
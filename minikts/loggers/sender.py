@@ -0,0 +1,229 @@
+import os
+import time
+import queue
+import itertools
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import attr
+import dill
+
+from minikts.monitoring import WARNING, report, shorten_path
+
+@attr.s
+class _Control:
+    action = attr.ib(type=str)
+    done = attr.ib(factory=threading.Event)
+
+def _group_by_channel(items):
+    groups = OrderedDict()
+    for _, kind, name, args in items:
+        groups.setdefault((kind, name), []).append(args)
+    return groups
+
+def read_spool(path):
+    """Reads values appended to a spool file as (kind, name, args), ignoring a truncated last item"""
+    return [item[1:] for item in _read_spool_items(path)]
+
+def _read_spool_items(path):
+    items = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                item = dill.load(f)
+            except EOFError:
+                break
+            except Exception:
+                report("logger", f"[!alert]Truncated[/] spool file [!path]{shorten_path(path)}[/]", level=WARNING)
+                break
+            # spools written before values were numbered hold (kind, name, args)
+            items.append(item if len(item) == 4 else (-1, *item))
+    return items
+
+@attr.s
+class BackgroundSender:
+    """Delivers logged values to a backend from a background thread
+
+    Logged values are put into a queue and returned immediately. The background thread
+    groups them into batches per channel and passes them to `deliver`, retrying
+    with exponential backoff. When the backend is unreachable or does not keep up,
+    values are appended to a spool file instead and replayed once the backend responds again.
+    Values are numbered on `send`, and spooled values are merged back in that order,
+    so that points of a channel reach the backend in the order they were logged.
+    Delivery is at-least-once: a batch failing halfway is retried as a whole.
+
+    Args:
+        deliver: function of (kind, name, points) sending a list of points of one channel
+        spool_path: path of append-only spool file
+        batch_size: maximum number of values taken from the queue at once
+        max_pending: maximum size of the queue, overflowing values are spooled
+        max_retries: number of retries before the batch is spooled
+        backoff: delay before the first retry in seconds, doubled after each retry
+        offline_period: time in seconds during which values are spooled after a failed delivery
+    """
+    deliver = attr.ib(repr=False)
+    spool_path = attr.ib(converter=Path)
+    batch_size = attr.ib(default=1000, type=int)
+    max_pending = attr.ib(default=100000, type=int)
+    max_retries = attr.ib(default=3, type=int)
+    backoff = attr.ib(default=0.5, type=float)
+    offline_period = attr.ib(default=30.0, type=float)
+    n_spooled = attr.ib(default=0, init=False)
+    _queue = attr.ib(init=False, repr=False)
+    _thread = attr.ib(default=None, init=False, repr=False)
+    _offline_until = attr.ib(default=0.0, init=False, repr=False)
+    _spool_lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+    _counter = attr.ib(factory=itertools.count, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        if self.spool_path.exists():
+            # values left by a previous run are older than any new value
+            self._counter = itertools.count(max((item[0] for item in _read_spool_items(self.spool_path)), default=-1) + 1)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="minikts-logger", daemon=True)
+        self._thread.start()
+        return self
+
+    def send(self, kind, name, *args):
+        item = (next(self._counter), kind, name, args)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._spool([item])
+
+    def flush(self, timeout=None):
+        """Waits until all values logged so far are delivered or spooled
+
+        Returns:
+            False if timeout expired, True otherwise
+        """
+        return self._control("flush", timeout)
+
+    def replay(self, timeout=None):
+        """Delivers spooled values, blocks until done or timeout expires"""
+        return self._control("replay", timeout)
+
+    def close(self, timeout=None):
+        """Delivers pending values and stops the background thread
+
+        Values which could not be delivered before timeout are spooled.
+        """
+        if self._thread is None:
+            return
+        finished = self._control("stop", timeout)
+        if not finished:
+            items = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if not isinstance(item, _Control):
+                    items.append(item)
+            self._spool(items)
+        self._thread = None
+        if self.n_spooled:
+            report("logger", f"[!number]{self.n_spooled}[/] values were spooled to [!path]{shorten_path(self.spool_path)}[/]")
+
+    def _control(self, action, timeout):
+        if self._thread is None:
+            return True
+        control = _Control(action)
+        self._queue.put(control)
+        return control.done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and not isinstance(batch[-1], _Control):
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            control = batch.pop() if isinstance(batch[-1], _Control) else None
+            if batch:
+                self._process(batch)
+            if control is None:
+                # values spooled on overflow are newer than the queue, they are sent once it is drained
+                if self._queue.empty() and self.spool_path.exists() and time.monotonic() >= self._offline_until:
+                    self._replay()
+                continue
+            if control.action in ("replay", "stop"):
+                self._replay()
+            control.done.set()
+            if control.action == "stop":
+                return
+
+    def _process(self, items, replay=True):
+        if time.monotonic() < self._offline_until:
+            self._spool(items)
+            return
+        if replay and self.spool_path.exists():
+            # spooled values logged before the newest value of the batch go first
+            max_seq = max(item[0] for item in items)
+            items = sorted(self._take_spooled(max_seq) + items, key=lambda item: item[0])
+        groups = list(_group_by_channel(items).items())
+        for i, ((kind, name), points) in enumerate(groups):
+            if not self._deliver_with_retries(kind, name, points):
+                self._offline_until = time.monotonic() + self.offline_period
+                undelivered = {channel for channel, _ in groups[i:]}
+                self._spool([item for item in items if item[1:3] in undelivered])
+                return
+
+    def _deliver_with_retries(self, kind, name, points):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.deliver(kind, name, points)
+                return True
+            except Exception as e:
+                error = e
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay *= 2
+        report("logger", f"[!alert]Failed[/] to send {kind} {name}: {error!r}, spooling", level=WARNING)
+        return False
+
+    def _take_spooled(self, max_seq=None):
+        """Removes spooled values numbered up to `max_seq` from the spool and returns them"""
+        with self._spool_lock:
+            if not self.spool_path.exists():
+                return []
+            items = _read_spool_items(self.spool_path)
+            taken = sorted((item for item in items if max_seq is None or item[0] <= max_seq), key=lambda item: item[0])
+            kept = [item for item in items if max_seq is not None and item[0] > max_seq]
+            if kept:
+                tmp_path = self.spool_path.with_name(f"{self.spool_path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, "wb") as f:
+                    for item in kept:
+                        f.write(dill.dumps(item))
+                os.replace(tmp_path, self.spool_path)
+            else:
+                self.spool_path.unlink()
+            self.n_spooled = len(kept)
+        return taken
+
+    def _replay(self):
+        items = self._take_spooled()
+        if items:
+            report("logger", f"Replaying [!number]{len(items)}[/] spooled values from [!path]{shorten_path(self.spool_path)}[/]")
+        self._offline_until = 0.0
+        self._process(items, replay=False)
+        return not self.spool_path.exists()
+
+    def _spool(self, items):
+        if not items:
+            return
+        with self._spool_lock:
+            with open(self.spool_path, "ab") as f:
+                for item in items:
+                    try:
+                        data = dill.dumps(item)
+                    except Exception as e:
+                        report("logger", f"[!alert]Dropped[/] {item[1]} {item[2]}, cannot spool it: {e!r}", level=WARNING)
+                        continue
+                    f.write(data)
+                    self.n_spooled += 1
@@ -1,5 +1,10 @@
+import sys
+
 import click
 
+from minikts.monitoring import WARNING, report, report_table, shorten_path
+from minikts.profile_history import METRICS, compare_records, find_previous_records, load_record
+from minikts.scheduler import BACKENDS, Scheduler, make_slots
 from minikts.templates.template_management import init_template, TEMPLATES
 
 @click.group()
@@ -11,3 +16,62 @@ def cli():
 @click.argument('name', type=click.Choice(TEMPLATES), nargs=1)
 def template(name):
     init_template(name)
+
+
+@cli.group()
+def profile():
+    pass
+
+
+@profile.command()
+@click.argument('run', type=click.Path(exists=True), nargs=1)
+@click.argument('baselines', type=click.Path(exists=True), nargs=-1)
+@click.option('--last', 'n_last', default=5, show_default=True,
+              help='Number of previous runs used as baseline if no baselines are given')
+@click.option('--metric', type=click.Choice(METRICS), default='p50', show_default=True)
+@click.option('--threshold', default=0.1, show_default=True, help='Relative slowdown flagged as regression')
+@click.option('--min-delta', default=0.0, show_default=True, help='Absolute slowdown in seconds never flagged')
+@click.option('--fail', is_flag=True, help='Exit with code 1 if any step regressed')
+def compare(run, baselines, n_last, metric, threshold, min_delta, fail):
+    """Compares profile of RUN with BASELINES or with median of previous runs
+
+    RUN and BASELINES are experiment directories or profile.json files.
+    """
+    record = load_record(run)
+    if baselines:
+        baseline_records = [load_record(baseline) for baseline in baselines]
+    else:
+        baseline_records = find_previous_records(record, n_last)
+    if not baseline_records:
+        raise click.ClickException(f"No baseline runs found for {run}")
+    report("prof", f"Comparing [!path]{shorten_path(record['path'])}[/] with [!number]{len(baseline_records)}[/] baseline runs")
+    fingerprints = {baseline["config_fingerprint"] for baseline in baseline_records}
+    if fingerprints != {record["config_fingerprint"]}:
+        report("prof", "[!alert]Config differs[/] between compared runs", level=WARNING)
+    comparison = compare_records(record, baseline_records, metric, threshold, min_delta)
+    report_table("profile comparison", comparison)
+    regressed = comparison["name"][comparison["regressed"]].tolist()
+    for name in regressed:
+        report("prof", f"Step [!step]{name}[/] [!alert]regressed[/]", level=WARNING)
+    if fail and regressed:
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('commands_file', type=click.File(), nargs=1)
+@click.option('--gpus', default='', help='Comma-separated indices of GPUs, one slot per GPU')
+@click.option('--cpu-slots', default=0, show_default=True, help='Number of slots with no GPU visible')
+@click.option('--backend', type=click.Choice(BACKENDS), default='tmux', show_default=True)
+@click.option('--session', 'session_name', default='minikts', show_default=True, help='Name of tmux session')
+@click.option('--poll-interval', default=0.5, show_default=True, help='Seconds between checks of finished jobs')
+def queue(commands_file, gpus, cpu_slots, backend, session_name, poll_interval):
+    """Runs commands from COMMANDS_FILE, one per line, dispatching each to a free slot"""
+    commands = [line.strip() for line in commands_file if line.strip() and not line.startswith("#")]
+    gpus = [int(gpu) for gpu in gpus.split(",") if gpu.strip()]
+    if not gpus and not cpu_slots:
+        raise click.ClickException("No slots, pass --gpus or --cpu-slots")
+    scheduler = Scheduler(make_slots(gpus, cpu_slots, backend, session_name), poll_interval=poll_interval)
+    scheduler.run(commands)
+    scheduler.report_stats()
+    if scheduler.stats()["failed"]:
+        sys.exit(1)
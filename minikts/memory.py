@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import threading
+
+import attr
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_process = psutil.Process() if psutil is not None else None
+
+def current_rss():
+    """Returns resident set size of current process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        pass
+    if _process is not None:
+        return _process.memory_info().rss
+    if resource is not None:
+        # peak RSS is the best available approximation, reported in bytes on macOS and in KB elsewhere
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    return 0
+
+@attr.s
+class RSSSampler:
+    """Tracks peak RSS during active measurements with a background thread
+
+    The thread runs only while at least one measurement is active.
+
+    Args:
+        interval: sampling interval in seconds
+    """
+    interval = attr.ib(default=0.01, type=float)
+    _peaks = attr.ib(factory=dict, init=False, repr=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+    _thread = attr.ib(default=None, init=False, repr=False)
+
+    def start(self):
+        """Starts a measurement
+
+        Returns:
+            Token to be passed to `stop` and RSS at start in bytes
+        """
+        rss = current_rss()
+        token = object()
+        with self._lock:
+            self._peaks[token] = rss
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="minikts-rss-sampler", daemon=True)
+                self._thread.start()
+        return token, rss
+
+    def stop(self, token):
+        """Stops a measurement
+
+        Returns:
+            RSS at stop and peak RSS during the measurement in bytes
+        """
+        rss = current_rss()
+        with self._lock:
+            peak = max(self._peaks.pop(token), rss)
+        return rss, peak
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = current_rss()
+            with self._lock:
+                if not self._peaks:
+                    self._thread = None
+                    return
+                for token, peak in self._peaks.items():
+                    if rss > peak:
+                        self._peaks[token] = rss
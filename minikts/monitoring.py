@@ -1,6 +1,22 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import functools
+
 from rich.console import Console
 from rich.table import Table
 
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
 _orange = "#F6BD4F"
 _magenta = "#FD6CF9"
 _red = "#FD6360"
@@ -15,24 +31,167 @@ _styles = {
     "!tmux_name": f"bold",
     "!alert": f"bold {_red}",
 }
+_styles_regex = re.compile("|".join(map(re.escape, _styles)))
+_markup_regex = re.compile(r"\[(?:![a-z_]+|/[^\]]*)\]")
 
 _console = Console(highlight=False)
 
+def _parse_level(level):
+    if isinstance(level, str):
+        if level.strip().isdigit():
+            return int(level)
+        parsed = logging.getLevelName(level.strip().upper())
+        if not isinstance(parsed, int):
+            raise ValueError(f"Unknown log level {level!r}, expected a number or one of DEBUG, INFO, WARNING, ERROR")
+        return parsed
+    return level
+
+@functools.lru_cache(maxsize=None)
+def _scope_header(scope):
+    return _stylize(f"[!scope]{scope.upper().rjust(10)}[/]")
+
+class _Reporter:
+    """Dispatches reports to the console and to an optional JSON-lines sink
+
+    In buffered mode reports are rendered by a writer thread, so that `report`
+    only puts a message into a queue. Output is written to `sys.stdout` as it was
+    at the moment of the call.
+    """
+    def __init__(self):
+        self.level = _parse_level(os.environ.get("MINIKTS_LOG_LEVEL", INFO))
+        self.console = True
+        self.json_sink = None
+        self._json_lock = threading.Lock()
+        self._console_lock = threading.RLock()
+        self._queue = None
+        self._thread = None
+
+    def configure(self, level=None, buffered=None, json_sink=None, console=None):
+        if level is not None:
+            self.level = _parse_level(level)
+        if console is not None:
+            self.console = console
+        if json_sink is not None:
+            with self._json_lock:
+                if self.json_sink is not None:
+                    self.json_sink.close()
+                self.json_sink = open(json_sink, "a", buffering=1) if json_sink else None
+        if buffered is not None and buffered != (self._thread is not None):
+            if buffered:
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name="minikts-reporter", daemon=True)
+                self._thread.start()
+            else:
+                self.flush()
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = self._queue = None
+
+    def submit(self, item):
+        if self._queue is not None:
+            self._queue.put(item)
+        else:
+            self._write(item)
+
+    def flush(self):
+        if self._queue is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                self._write(item)
+            except Exception:
+                pass
+
+    def _write(self, item):
+        kind, file, timestamp, level, scope, payload = item
+        if self.console:
+            with self._console_lock:
+                previous_file = _console._file
+                _console.file = file
+                try:
+                    if kind == "message":
+                        _console.print(_scope_header(scope), _stylize(payload))
+                    else:
+                        _console.print(payload[0])
+                finally:
+                    _console._file = previous_file
+        if self.json_sink is not None:
+            record = {"time": timestamp, "level": logging.getLevelName(level), "scope": scope}
+            if kind == "message":
+                record["message"] = _markup_regex.sub("", payload)
+            else:
+                record["table"] = scope
+                record["n_rows"] = payload[1]
+            with self._json_lock:
+                self.json_sink.write(json.dumps(record) + "\n")
+
+_reporter = _Reporter()
+if "MINIKTS_LOG_JSON" in os.environ:
+    _reporter.configure(json_sink=os.environ["MINIKTS_LOG_JSON"])
+atexit.register(_reporter.flush)
+
+def configure(level=None, buffered=None, json_sink=None, console=None):
+    """Configures reporting
+
+    Args:
+        level: minimum level of reported messages, e.g. `monitoring.DEBUG` or "warning"
+        buffered: if set to True, messages are rendered by a background writer thread
+        json_sink: path of a JSON-lines file each message is appended to, empty string disables it
+        console: if set to False, messages are not printed
+
+    Examples:
+        >>> monitoring.configure(level="warning", json_sink="report.jsonl")
+    """
+    _reporter.configure(level, buffered, json_sink, console)
+
+def set_level(level):
+    _reporter.level = _parse_level(level)
+
+def is_enabled(level=INFO):
+    """Returns True if messages of `level` are reported, use it to skip building expensive messages"""
+    return level >= _reporter.level
+
+def flush():
+    """Waits until buffered messages are written"""
+    _reporter.flush()
+
 def _stylize(s: str):
-    for shortcut, style in _styles.items():
-        s = s.replace(shortcut, style)
-    return s
+    return _styles_regex.sub(lambda match: _styles[match.group(0)], s)
 
-def report(scope, message):
-    scope = scope.upper().rjust(10)
-    _console.print(_stylize(f"[!scope]{scope}[/]"), _stylize(message))
+def report(scope, message, level=INFO):
+    if level < _reporter.level:
+        return
+    _reporter.submit(("message", sys.stdout, time.time(), level, scope, message))
 
-def report_table(name, table):
+def report_table(name, table, max_rows=100, level=INFO):
+    """Reports dataframe as a table, showing first and last rows if it is longer than `max_rows`"""
+    if level < _reporter.level:
+        return
     title = f"[!table_title]{name.upper()}[/]"
-    rich_table = Table(*table.columns, title=_stylize(title))
-    for _, row in table.iterrows():
-        rich_table.add_row(*map(str, row.values))
-    _console.print(rich_table)
+    n_rows = len(table)
+    caption = None
+    if max_rows is not None and n_rows > max_rows:
+        head, tail = max_rows - max_rows // 2, max_rows // 2
+        table = table.iloc[list(range(head)) + list(range(n_rows - tail, n_rows))]
+        caption = f"{max_rows} of {n_rows} rows"
+    values = table.to_numpy(dtype=object)
+    rich_table = Table(*map(str, table.columns), title=_stylize(title), caption=caption)
+    for i, row in enumerate(values):
+        if caption is not None and i == head:
+            rich_table.add_row(*["…"] * len(row))
+        rich_table.add_row(*map(str, row))
+    _reporter.submit(("table", sys.stdout, time.time(), level, name, (rich_table, n_rows)))
 
 def shorten_path(path, len_limit=35, placeholder="[..]"):
     path = str(path)
@@ -44,4 +203,4 @@ def shorten_path(path, len_limit=35, placeholder="[..]"):
             else:
                 break
         path = placeholder + path[-split_point:]
-    return path
\ No newline at end of file
+    return path
@@ -1,35 +1,359 @@
+import os
 import sys
+import codecs
+import ctypes
+import queue
+import threading
 import attr
 import parse
-from contextlib import redirect_stdout
+from contextlib import contextmanager, redirect_stdout
+from string import Formatter
+
+from minikts.monitoring import WARNING, report
 
 original_stdout = sys.stdout
+_thread_state = threading.local()
+
+def _longest_literal(pattern):
+    literals = [literal for literal, *_ in Formatter().parse(pattern)]
+    return max(literals, key=len, default="").lower()
+
+@attr.s(frozen=True)
+class CompiledPattern:
+    """Pattern compiled with `parse.compile` along with its longest literal part
+
+    The literal is checked with a plain substring search before running the regex,
+    so lines that cannot match are rejected cheaply.
+    """
+    parser = attr.ib()
+    literal = attr.ib(type=str)
+
+    @classmethod
+    def from_format(cls, pattern):
+        if isinstance(pattern, cls):
+            return pattern
+        return cls(parser=parse.compile(pattern), literal=_longest_literal(pattern))
+
+    def search(self, line, lowered_line):
+        if self.literal not in lowered_line:
+            return None
+        return self.parser.search(line)
+
+def _compile_patterns(patterns):
+    return [CompiledPattern.from_format(pattern) for pattern in patterns]
 
 @attr.s()
 class StreamParser:
-    patterns = attr.ib()
-    buf = attr.ib(factory=str, init=False)
+    patterns = attr.ib(converter=_compile_patterns)
     callbacks = attr.ib(default=[print])
+    output = attr.ib(default=original_stdout, repr=False)
+    passthrough = attr.ib(default=False)
+    _buf = attr.ib(factory=list, init=False)
+    _lock = attr.ib(factory=threading.RLock, init=False, repr=False)
 
     def write(self, b):
-        self.buf += b
-        if self.buf.find('\n') != -1:
-            self.flush()
-            
+        if getattr(_thread_state, "passthrough", False):
+            return self.output.write(b)
+        if self.passthrough:
+            self.output.write(b)
+        with self._lock:
+            self._buf.append(b)
+            if '\n' not in b:
+                return
+            text = ''.join(self._buf)
+            lines_end = text.rfind('\n')
+            tail = text[lines_end + 1:]
+            self._buf = [tail] if tail else []
+            self._process(text[:lines_end].strip().split('\n'))
+
     def flush(self):
-        for line in self.buf.strip().split('\n'):
-            line_result = dict()
-            for pattern in self.patterns:
-                pattern_result = parse.search(pattern, line)
-                if pattern_result is None:
-                    continue
-                line_result = {**line_result, **pattern_result.named}
-            with redirect_stdout(original_stdout):
+        if getattr(_thread_state, "passthrough", False):
+            return self.output.flush()
+        with self._lock:
+            text = ''.join(self._buf)
+            self._buf = []
+            if text.strip():
+                self._process(text.strip().split('\n'))
+
+    def parse_line(self, line):
+        line_result = dict()
+        lowered_line = line.lower()
+        for pattern in self.patterns:
+            pattern_result = pattern.search(line, lowered_line)
+            if pattern_result is None:
+                continue
+            line_result.update(pattern_result.named)
+        return line_result
+
+    def _process(self, lines):
+        _thread_state.passthrough = True
+        try:
+            for line in lines:
+                line_result = self.parse_line(line)
                 for callback in self.callbacks:
                     callback(line_result)
-        self.buf = str()
+        finally:
+            _thread_state.passthrough = False
+
+_ON_FULL_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+def _finish(callbacks):
+    for callback in callbacks:
+        on_finish = getattr(callback, "on_finish", None)
+        if on_finish is not None:
+            on_finish()
+
+def _dispatch_batch(callback, records):
+    on_batch = getattr(callback, "on_batch", None)
+    if on_batch is not None:
+        on_batch(records)
+        return
+    for record in records:
+        callback(record)
+
+@attr.s
+class AsyncDispatcher:
+    """Passes parsed records to callbacks from a background thread
+
+    Records are put into a bounded queue and drained in batches. Callbacks
+    defining `on_batch(records)` receive the whole batch at once, others are
+    called once per record. `on_finish()` of callbacks is called after the
+    queue is drained. Anything printed by callbacks bypasses the parser.
+
+    Args:
+        callbacks: callbacks to be called from the background thread
+        queue_size: maximum number of pending records
+        batch_size: maximum number of records passed to callbacks at once
+        on_full: what to do when the queue is full, one of
+            "block" (wait for the background thread),
+            "drop_newest" (discard the incoming record) or
+            "drop_oldest" (discard the oldest pending record)
+    """
+    callbacks = attr.ib()
+    queue_size = attr.ib(default=1024, type=int)
+    batch_size = attr.ib(default=64, type=int)
+    on_full = attr.ib(default="block", validator=attr.validators.in_(_ON_FULL_POLICIES))
+    n_dropped = attr.ib(default=0, init=False)
+    _queue = attr.ib(init=False, repr=False)
+    _thread = attr.ib(default=None, init=False, repr=False)
+    _error = attr.ib(default=None, init=False, repr=False)
+    _sentinel = object()
+
+    def __attrs_post_init__(self):
+        self._queue = queue.Queue(maxsize=self.queue_size)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="minikts-parse-stdout", daemon=True)
+        self._thread.start()
+        return self
+
+    def __call__(self, record):
+        if self.on_full == "block":
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            self.n_dropped += 1
+            if self.on_full == "drop_newest":
+                return
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def close(self):
+        """Waits until all pending records are dispatched and stops the background thread"""
+        if self._thread is None:
+            return
+        self._queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+        if self.n_dropped:
+            report("parser", f"[!alert]Dropped[/] [!number]{self.n_dropped}[/] parsed records, queue was full", level=WARNING)
+        if self._error is not None:
+            raise self._error
+
+    def on_finish(self):
+        self.close()
+        _finish(self.callbacks)
+
+    def _run(self):
+        _thread_state.passthrough = True
+        stopped = False
+        while not stopped:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is self._sentinel:
+                batch.pop()
+                stopped = True
+            if batch and self._error is None:
+                try:
+                    for callback in self.callbacks:
+                        _dispatch_batch(callback, batch)
+                except Exception as e:
+                    self._error = e
 
-def parse_stdout(patterns, *callbacks):
+_FD_READ_SIZE = 1 << 16
+_FD_DRAIN_TIMEOUT = 5.0
+
+def _flush_c_stdio():
+    try:
+        ctypes.CDLL(None).fflush(None)
+    except (OSError, AttributeError, TypeError):
+        pass
+
+@attr.s
+class FdCapture:
+    """Redirects a file descriptor to a pipe drained into a parser by a background thread
+
+    Captures output written by native code (e.g. C++ training loops of CatBoost,
+    XGBoost or LightGBM) directly to the file descriptor, bypassing `sys.stdout`.
+
+    Args:
+        fd: file descriptor to capture, e.g. 1 for stdout or 2 for stderr
+        parser: StreamParser receiving captured output
+        passthrough: if set to True, captured output is also written to the original descriptor
+    """
+    fd = attr.ib(type=int)
+    parser = attr.ib(repr=False)
+    passthrough = attr.ib(default=False, type=bool)
+    saved_fd = attr.ib(default=None, init=False)
+    _read_fd = attr.ib(default=None, init=False, repr=False)
+    _thread = attr.ib(default=None, init=False, repr=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+    _finished = attr.ib(default=False, init=False, repr=False)
+    _detached = attr.ib(default=False, init=False, repr=False)
+
+    def start(self):
+        _flush_c_stdio()
+        self.saved_fd = os.dup(self.fd)
+        try:
+            self._read_fd, write_fd = os.pipe()
+            try:
+                os.dup2(write_fd, self.fd)
+            finally:
+                os.close(write_fd)
+        except BaseException:
+            if self._read_fd is not None:
+                os.close(self._read_fd)
+            os.close(self.saved_fd)
+            raise
+        self._thread = threading.Thread(target=self._run, name=f"minikts-fd-{self.fd}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Restores the descriptor and waits until all captured output is parsed
+
+        If the pipe is still held open by another process after a timeout, the reader
+        thread is left running and closes the descriptors itself once the pipe is closed.
+        """
+        if self._thread is None:
+            return
+        _flush_c_stdio()
+        os.dup2(self.saved_fd, self.fd)
+        self._thread.join(_FD_DRAIN_TIMEOUT)
+        with self._lock:
+            if self._finished:
+                self._close_fds()
+            else:
+                self._detached = True
+                report("parser", f"[!alert]Stopped waiting[/] for output of fd [!number]{self.fd}[/], "
+                                 "it is still held open by another process", level=WARNING)
+        self._thread = None
+
+    def _close_fds(self):
+        os.close(self._read_fd)
+        os.close(self.saved_fd)
+
+    def _run(self):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            while True:
+                chunk = os.read(self._read_fd, _FD_READ_SIZE)
+                if not chunk:
+                    break
+                if self.passthrough:
+                    os.write(self.saved_fd, chunk)
+                self.parser.write(decoder.decode(chunk))
+            self.parser.write(decoder.decode(b"", final=True))
+        finally:
+            # descriptors are closed by whoever comes last: `stop` or the thread detached by it
+            with self._lock:
+                self._finished = True
+                if self._detached:
+                    self._close_fds()
+
+@attr.s
+class FdWriter:
+    """Replaces `sys.stdout` while file descriptor 1 is captured
+
+    Writes go to the captured descriptor, so that Python and native output
+    reach the parser in the order they were written.
+    """
+    fd = attr.ib(type=int)
+    output = attr.ib(repr=False)
+
+    def write(self, b):
+        if getattr(_thread_state, "passthrough", False):
+            return self.output.write(b)
+        os.write(self.fd, b.encode("utf-8"))
+        return len(b)
+
+    def flush(self):
+        if getattr(_thread_state, "passthrough", False):
+            self.output.flush()
+
+@contextmanager
+def _parsing_stdout(parser, capture_fds=(), passthrough=False):
+    captures = []
+    stdout = parser
+    try:
+        if capture_fds:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            try:
+                for fd in capture_fds:
+                    captures.append(FdCapture(fd, parser, passthrough=passthrough).start())
+                parser.output = open(os.dup(captures[0].saved_fd), "w", buffering=1)
+            except BaseException:
+                # descriptors captured so far are restored if a later one fails
+                for capture in reversed(captures):
+                    capture.stop()
+                captures = []
+                raise
+            stdout = FdWriter(1, parser.output)
+        with redirect_stdout(stdout):
+            try:
+                yield parser
+            finally:
+                for capture in captures:
+                    capture.stop()
+                parser.flush()
+    finally:
+        _finish(parser.callbacks)
+        if captures:
+            parser.output.close()
+
+def parse_stdout(patterns, *callbacks, 
+    capture_fd=False, 
+    capture_stderr=False, 
+    passthrough=False, 
+    asynchronous=False, 
+    queue_size=1024, 
+    batch_size=64, 
+    on_full="block",
+):
     """Parses each stdout line in line with `patterns` argument and sequentially calls callbacks
 
     Args:
@@ -37,9 +361,24 @@ def parse_stdout(patterns, *callbacks):
         *callbacks: 
             any functions or functors to be called from result of pattern search,
             order matters, as callbacks can modify the pattern search dictionary
+        capture_fd: 
+            if set to True, file descriptor 1 is also redirected to a pipe, so that
+            output written by native code (e.g. CatBoost or XGBoost) is parsed as well
+        capture_stderr: if set to True, also captures file descriptor 2, requires `capture_fd`
+        passthrough: if set to True, captured output is also printed to the terminal
+        asynchronous: 
+            if set to True, callbacks are called in batches from a background thread,
+            so that slow callbacks do not stall the training loop
+        queue_size: maximum number of pending records in asynchronous mode
+        batch_size: maximum number of records dispatched at once in asynchronous mode
+        on_full: 
+            policy applied when the queue is full in asynchronous mode,
+            one of "block", "drop_newest", "drop_oldest"
 
     Returns:
-        Context manager redirecting stdout and parsing it line-by-line
+        Context manager redirecting stdout and parsing it line-by-line,
+        remaining output is parsed, pending records are dispatched and
+        `on_finish()` of callbacks defining it is called on exit
 
     Examples:
         >>> import minikts.api as kts
@@ -47,8 +386,31 @@ def parse_stdout(patterns, *callbacks):
         >>> with kts.parse_stdout(kts.patterns.lightgbm, kts.MatplotlibCallback(interval=50)):
         ...     model = LGBMClassifier(n_estimators=1000)
         ...     model.fit(x_train, y_train, eval_set=[(x_train, y_train), (x_test, y_test)])
+        >>> with kts.parse_stdout(kts.patterns.lightgbm, kts.LoggerCallback(logger=logger), asynchronous=True):
+        ...     model = LGBMClassifier(n_estimators=1000)
+        ...     model.fit(x_train, y_train, eval_set=[(x_train, y_train), (x_test, y_test)])
+
+        >>> from catboost import CatBoostClassifier
+        >>> with kts.parse_stdout(kts.patterns.catboost, kts.LoggerCallback(logger=logger), capture_fd=True, passthrough=True):
+        ...     model = CatBoostClassifier(n_estimators=1000)
+        ...     model.fit(x_train, y_train, eval_set=(x_test, y_test))
     """
-    return redirect_stdout(StreamParser(patterns, callbacks=callbacks))
+    if capture_stderr and not capture_fd:
+        raise ValueError("capture_stderr=True requires capture_fd=True")
+    if asynchronous:
+        dispatcher = AsyncDispatcher(
+            list(callbacks), 
+            queue_size=queue_size, 
+            batch_size=batch_size, 
+            on_full=on_full,
+        )
+        callbacks = [dispatcher.start()]
+    if capture_fd:
+        capture_fds = (1, 2) if capture_stderr else (1,)
+        parser = StreamParser(patterns, callbacks=callbacks)
+        return _parsing_stdout(parser, capture_fds=capture_fds, passthrough=passthrough)
+    parser = StreamParser(patterns, callbacks=callbacks, passthrough=passthrough)
+    return _parsing_stdout(parser)
 
 class Patterns:
     """Common patterns for stdout parsing
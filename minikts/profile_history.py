@@ -0,0 +1,109 @@
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import List, Union
+
+PROFILE_FILENAME = "profile.json"
+METRICS = ("mean", "p50", "p95", "p99", "max", "sum", "self")
+
+def config_fingerprint(config):
+    """Returns short digest of config contents, equal for equal configs"""
+    dumped = json.dumps(config.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha256(dumped.encode()).hexdigest()[:16]
+
+def make_record(profiler_stats, cache_stats, fingerprint):
+    """Makes a compact JSON-serializable record of a profiled run
+
+    Args:
+        profiler_stats: dict of StepStats, as passed to final callbacks of the profiler
+        cache_stats: dict of cache hits and misses, see `minikts.cache.cache_stats`
+        fingerprint: config fingerprint
+    """
+    steps = dict()
+    for name, stats in profiler_stats.items():
+        if stats.calls == 0:
+            continue
+        steps[name] = {
+            "calls": stats.calls,
+            "sum": stats.sum_time,
+            "self": stats.self_time,
+            "mean": stats.mean_time,
+            "p50": stats.quantile_time(0.5),
+            "p95": stats.quantile_time(0.95),
+            "p99": stats.quantile_time(0.99),
+            "max": stats.max_time,
+        }
+    return {
+        "timestamp": time.time(),
+        "config_fingerprint": fingerprint,
+        "steps": steps,
+        "caches": {name: counts for name, counts in cache_stats.items() if counts["hits"] or counts["misses"]},
+    }
+
+def save_record(record, dir: Union[Path, str]):
+    path = Path(dir) / PROFILE_FILENAME
+    with open(path, "w") as f:
+        json.dump(record, f, separators=(",", ":"))
+    return path
+
+def _profile_path(path):
+    path = Path(path)
+    return path / PROFILE_FILENAME if path.is_dir() else path
+
+def load_record(path: Union[Path, str]):
+    """Loads record saved by the profiler, `path` is either an experiment directory or a profile file"""
+    path = _profile_path(path)
+    with open(path) as f:
+        record = json.load(f)
+    record["path"] = path
+    return record
+
+def find_previous_records(record, n_last: int):
+    """Returns up to `n_last` records of sibling experiments made before `record`, latest first"""
+    experiments_dir = record["path"].parent.parent
+    records = []
+    for path in experiments_dir.glob(f"*/{PROFILE_FILENAME}"):
+        if path == record["path"]:
+            continue
+        other = load_record(path)
+        if other["timestamp"] < record["timestamp"]:
+            records.append(other)
+    records.sort(key=lambda other: other["timestamp"], reverse=True)
+    return records[:n_last]
+
+def compare_records(record, baselines: List[dict], metric: str = "p50", threshold: float = 0.1, min_delta: float = 0.0):
+    """Compares step timings of a run with the median of baseline runs
+
+    Args:
+        record: record of the run
+        baselines: records of baseline runs
+        metric: compared timing, one of mean, p50, p95, p99, max, sum, self
+        threshold: relative slowdown above which a step is flagged as regressed
+        min_delta: absolute slowdown in seconds below which a step is never flagged
+
+    Returns:
+        Dataframe with baseline and current timings of each step, sorted by relative change
+    """
+    import numpy as np
+    import pandas as pd
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric}, expected one of {', '.join(METRICS)}")
+    names = list(record["steps"])
+    for baseline in baselines:
+        names += [name for name in baseline["steps"] if name not in names]
+    rows = []
+    for name in names:
+        baseline_values = [baseline["steps"][name][metric] for baseline in baselines if name in baseline["steps"]]
+        baseline_value = float(np.median(baseline_values)) if baseline_values else float("nan")
+        current_value = record["steps"][name][metric] if name in record["steps"] else float("nan")
+        change = current_value / baseline_value - 1 if baseline_value > 0 else float("nan")
+        rows.append({
+            "name": name,
+            f"baseline_{metric} (s)": baseline_value,
+            f"current_{metric} (s)": current_value,
+            "change": change,
+            "regressed": bool(change > threshold and current_value - baseline_value > min_delta),
+        })
+    result = pd.DataFrame(rows, columns=["name", f"baseline_{metric} (s)", f"current_{metric} (s)", "change", "regressed"])
+    return result.sort_values("change", ascending=False, na_position="last")
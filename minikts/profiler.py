@@ -1,107 +1,645 @@
+import os
+import json
+import math
 import time
+import atexit
+import stat
+import pickle
+import shutil
+import secrets
+import tempfile
 import functools
+import threading
+import multiprocessing
+from pathlib import Path
+
+import tracemalloc
 
 import attr
 from box import Box
 
-import numpy as np
-import pandas as pd
-
 from minikts.config import register_postload_hook, config
-from minikts.monitoring import report, report_table
+from minikts.context import ctx
+from minikts.memory import RSSSampler
+from minikts.profile_history import config_fingerprint, make_record, save_record
+from minikts.sampling import StackSampler
+from minikts.monitoring import WARNING, report, report_table, shorten_path
+
+try:
+    _now_ns = time.perf_counter_ns
+except AttributeError:
+    def _now_ns():
+        return int(time.perf_counter() * 1e9)
+
+class QuantileSketch:
+    """Streaming quantile sketch with bounded relative error
+
+    Values are counted in logarithmic buckets, so that any quantile is estimated
+    with relative error below `relative_accuracy` using memory logarithmic in
+    the range of values.
+    """
+    __slots__ = ("relative_accuracy", "count", "_log_gamma", "_gamma", "_buckets", "_n_zeros")
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = dict()
+        self._n_zeros = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self._n_zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        buckets = self._buckets
+        buckets[key] = buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self._n_zeros += other._n_zeros
+        for key, count in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float("nan")
+        rank = q * (self.count - 1)
+        seen = self._n_zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen > rank:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
+
+_RSS_DELTA_COLUMN = "max_rss_delta (MB)"
+
+class StepStats:
+    """Timing statistics of a profiled step, timings are stored in nanoseconds
+
+    Self time excludes time spent in nested profiled steps. Callbacks may put
+    additional aggregated values into `columns`, they are added to the report.
+    On merge numeric columns take the maximum, others (e.g. top allocations)
+    are taken from the statistics with the largest RSS delta.
+    """
+    __slots__ = ("name", "calls", "total_ns", "self_ns", "max_ns", "sketch", "columns")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total_ns = 0
+        self.self_ns = 0
+        self.max_ns = 0
+        self.sketch = QuantileSketch()
+        self.columns = dict()
+
+    def add(self, elapsed_ns, self_ns):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        self.self_ns += self_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.sketch.add(elapsed_ns)
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total_ns += other.total_ns
+        self.self_ns += other.self_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.sketch.merge(other.sketch)
+        no_delta = float("-inf")
+        other_heavier = other.columns.get(_RSS_DELTA_COLUMN, no_delta) > self.columns.get(_RSS_DELTA_COLUMN, no_delta)
+        for key, value in other.columns.items():
+            if isinstance(value, (int, float)):
+                self.columns[key] = max(self.columns.get(key, value), value)
+            elif key not in self.columns or other_heavier:
+                self.columns[key] = value
+
+    @property
+    def sum_time(self):
+        return self.total_ns / 1e9
+
+    @property
+    def self_time(self):
+        return self.self_ns / 1e9
+
+    @property
+    def mean_time(self):
+        return self.total_ns / self.calls / 1e9 if self.calls else float("nan")
+
+    @property
+    def max_time(self):
+        return self.max_ns / 1e9
+
+    def quantile_time(self, q):
+        return self.sketch.quantile(q) / 1e9
+
+class SpanNode:
+    """Node of the call tree, aggregating all calls of a step made from the same call path"""
+    __slots__ = ("name", "calls", "total_ns", "self_ns", "children")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total_ns = 0
+        self.self_ns = 0
+        self.children = dict()
+
+    def child(self, name):
+        node = self.children.get(name, None)
+        if node is None:
+            node = self.children[name] = SpanNode(name)
+        return node
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total_ns += other.total_ns
+        self.self_ns += other.self_ns
+        for name, child in other.children.items():
+            self.child(name).merge(child)
+
+    def walk(self, depth=0):
+        for child in self.children.values():
+            yield child, depth
+            yield from child.walk(depth + 1)
+
+class _ThreadRecord:
+    """Statistics and call stack of a single thread, only mutated by this thread"""
+    __slots__ = ("worker", "stats", "root", "stack", "data")
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.stats = dict()
+        self.root = SpanNode("<root>")
+        self.stack = [[self.root, 0]]
+        self.data = Box(default_box=True)
+
+    def new_stats(self, name):
+        stats = self.stats[name] = StepStats(name)
+        return stats
 
 @attr.s
 class Profiler:
+    """Measures time spent in decorated functions
+
+    Timings are always collected with `time.perf_counter_ns` into preallocated
+    per-step statistics. Nested calls of profiled functions form a call tree,
+    separating self time from total time. Pre- and post-callbacks are opt-in:
+    while none is registered, a call costs only a few clock reads and counter updates.
+
+    With `set_option("trace", True)` every call is also recorded as a span with
+    process and thread ids, which can be saved with `export_chrome_trace`.
+    With `set_option("memory", True)` RSS delta and peak RSS of each step are
+    recorded, `set_option("memory_top", n)` additionally reports top `n`
+    allocations of each call found with tracemalloc.
+    With `set_option("sample", hz)` Python stacks of threads inside profiled steps
+    are sampled `hz` times per second, collapsed stacks and an SVG flamegraph
+    are saved to workdir on report.
+
+    Each thread records into its own statistics, which are merged on report.
+    Child processes (multiprocessing, joblib) save their statistics after each
+    top-level profiled call to a private temporary directory of the parent, so that
+    `report` shows statistics per worker and in total. Other subprocesses, such as
+    scheduler jobs, keep their statistics to themselves.
+
+    When workdir is an experiment directory, `report` saves a compact record of
+    the run (timings, cache stats and config fingerprint) to `profile.json`,
+    runs are compared with `minikts profile compare`. Use `set_option("history", False)`
+    to disable it.
+    """
     callback_options = attr.ib(init=False, factory=dict)
-    _data = attr.ib(init=False, factory=functools.partial(Box, default_box=True))
+    _records = attr.ib(init=False, factory=list, repr=False)
+    _records_lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+    _local = attr.ib(init=False, factory=threading.local, repr=False)
+    _events = attr.ib(init=False, default=None, repr=False)
+    _shipped_events = attr.ib(init=False, default=0, repr=False)
+    _thread_names = attr.ib(init=False, factory=dict, repr=False)
+    _children_dir = attr.ib(init=False, default=None, repr=False)
+    _ship_dir = attr.ib(init=False, default=None, repr=False)
     _pre_callbacks = attr.ib(init=False, factory=list)
     _post_callbacks = attr.ib(init=False, factory=list)
     _final_callbacks = attr.ib(init=False, factory=list)
 
     def profile(self, **callback_kwargs):
+        if self is profiler:
+            _setup_children_dir()
+
         def wrapper(method):
-            method_name = method.__name__
+            name = method.__name__
+
             @functools.wraps(method)
             def _wrapped(*fargs, **fkwargs):
-                callback_kwargs.update(self.callback_options)
-                method_data = self._data[method_name]
-                method_data.name = method_name
-                for callback in self._pre_callbacks:
-                    callback(method_data, **callback_kwargs)
-                result = method(*fargs, **fkwargs)
-                for callback in self._post_callbacks:
-                    callback(method_data, **callback_kwargs)
-                return result
+                record = getattr(self._local, "record", None) or self._new_record()
+                stats = record.stats.get(name, None) or record.new_stats(name)
+                verbose = self.callback_options.get("verbose", callback_kwargs.get("verbose", True))
+                if verbose or self._pre_callbacks or self._post_callbacks:
+                    kwargs = {**callback_kwargs, **self.callback_options}
+                    return self._call_instrumented(method, record, stats, kwargs, fargs, fkwargs)
+                return self._call(method, record, stats, fargs, fkwargs)[0]
             return _wrapped
         return wrapper
 
+    def _new_record(self):
+        thread = threading.current_thread()
+        worker = thread.name
+        if self._ship_dir is not None:
+            process_name = multiprocessing.current_process().name
+            if process_name == "MainProcess":
+                process_name = f"pid-{os.getpid()}"
+            worker = f"{process_name}/{worker}"
+        record = self._local.record = _ThreadRecord(worker)
+        with self._records_lock:
+            self._records.append(record)
+            self._thread_names[thread.ident] = thread.name
+        return record
+
+    def _call(self, method, record, stats, fargs, fkwargs):
+        stack = record.stack
+        parent = stack[-1][0]
+        node = parent.children.get(stats.name, None) or parent.child(stats.name)
+        frame = [node, 0]
+        stack.append(frame)
+        start = _now_ns()
+        try:
+            result = method(*fargs, **fkwargs)
+        finally:
+            elapsed_ns = _now_ns() - start
+            stack.pop()
+            stack[-1][1] += elapsed_ns
+            self_ns = elapsed_ns - frame[1]
+            stats.add(elapsed_ns, self_ns)
+            node.calls += 1
+            node.total_ns += elapsed_ns
+            node.self_ns += self_ns
+            if self._events is not None:
+                self._events.append((stats.name, start, elapsed_ns, threading.get_ident()))
+            if self._ship_dir is not None and len(stack) == 1:
+                self._ship()
+        return result, elapsed_ns
+
+    def _call_instrumented(self, method, record, stats, kwargs, fargs, fkwargs):
+        verbose = kwargs.get("verbose", True)
+        data = record.data[stats.name]
+        data.name = stats.name
+        data.stats = stats
+        if verbose:
+            report("prof", f"Step [!step]{stats.name}[/] started")
+        for callback in self._pre_callbacks:
+            callback(data, **kwargs)
+        # post-callbacks run even if the step raises, e.g. TrialPruned or KeyboardInterrupt,
+        # so that memory and sampling measurements started by pre-callbacks are stopped
+        start = _now_ns()
+        elapsed_ns = None
+        try:
+            result, elapsed_ns = self._call(method, record, stats, fargs, fkwargs)
+        finally:
+            data.calls = stats.calls
+            data.timing = (elapsed_ns if elapsed_ns is not None else _now_ns() - start) / 1e9
+            for callback in self._post_callbacks:
+                callback(data, **kwargs)
+            if verbose and elapsed_ns is None:
+                report("prof", f"Step [!step]{stats.name}[/] [!alert]failed[/] after [!time]{data.timing:.5f}s[/]", level=WARNING)
+        if verbose:
+            report("prof", f"Step [!step]{stats.name}[/] finished, took [!time]{data.timing:.5f}s[/]")
+        return result
+
+    def get_stats(self):
+        """Returns statistics of each step merged over all threads and child processes"""
+        merged = dict()
+        for _, stats, _ in self._worker_records():
+            for name, step_stats in list(stats.items()):
+                merged.setdefault(name, StepStats(name)).merge(step_stats)
+        return merged
+
+    def get_worker_stats(self):
+        """Returns statistics of each step per worker, i.e. thread or thread of a child process"""
+        workers = dict()
+        for worker, stats, _ in self._worker_records():
+            worker_stats = workers.setdefault(worker, dict())
+            for name, step_stats in list(stats.items()):
+                worker_stats.setdefault(name, StepStats(name)).merge(step_stats)
+        return workers
+
     def report(self, **callback_kwargs):
+        stats = self.get_stats()
+        callback_kwargs = {**self.callback_options, **callback_kwargs}
         for callback in self._final_callbacks:
-            callback(self._data, **callback_kwargs)
+            callback(stats, **callback_kwargs)
 
     def set_option(self, key, value):
         self.callback_options[key] = value
+        if key == "trace":
+            self._events = list() if value else None
+        if key == "memory":
+            memory_callbacks_registered = on_start_track_memory in self._pre_callbacks
+            if value and not memory_callbacks_registered:
+                self.pre_callback(on_start_track_memory)
+                self.post_callback(on_stop_track_memory)
+            elif not value and memory_callbacks_registered:
+                self._pre_callbacks.remove(on_start_track_memory)
+                self._post_callbacks.remove(on_stop_track_memory)
+        if key == "sample":
+            sample_callbacks_registered = on_start_sample in self._pre_callbacks
+            if value:
+                _stack_sampler.hz = value
+            if value and not sample_callbacks_registered:
+                self.pre_callback(on_start_sample)
+                self.post_callback(on_stop_sample)
+            elif not value and sample_callbacks_registered:
+                self._pre_callbacks.remove(on_start_sample)
+                self._post_callbacks.remove(on_stop_sample)
+
+    def call_tree(self):
+        """Returns call tree merged over all workers as a list of (node, depth) pairs in depth-first order"""
+        root = SpanNode("<root>")
+        for _, _, worker_root in self._worker_records():
+            root.merge(worker_root)
+        return list(root.walk())
+
+    def _worker_records(self):
+        with self._records_lock:
+            records = [(record.worker, record.stats, record.root) for record in self._records]
+        if self._children_dir is not None and _private_dir(self._children_dir):
+            for path in sorted(self._children_dir.glob("*.pkl")):
+                try:
+                    records += pickle.loads(path.read_bytes())
+                except Exception as e:
+                    report("prof", f"[!alert]Failed[/] to load profile of child process [!path]{shorten_path(path)}[/]: {e!r}", level=WARNING)
+        return records
+
+    def _ship(self):
+        with self._records_lock:
+            try:
+                data = pickle.dumps([(record.worker, record.stats, record.root) for record in self._records])
+            except RuntimeError:
+                # another thread added a step meanwhile, it will ship the statistics itself
+                return
+        if not _private_dir(self._ship_dir, create=True):
+            return
+        path = self._ship_dir / f"{os.getpid()}.pkl"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        if self._events is not None and len(self._events) > self._shipped_events:
+            # spans are appended in chunks, so that each is pickled once
+            events = self._events[self._shipped_events:]
+            self._shipped_events += len(events)
+            with open(path.with_suffix(".trace"), "ab") as f:
+                f.write(pickle.dumps((dict(self._thread_names), events)))
+
+    def _child_traces(self):
+        """Returns (pid, thread names, spans) of child processes which shipped spans"""
+        traces = []
+        if self._children_dir is None or not _private_dir(self._children_dir):
+            return traces
+        for path in sorted(self._children_dir.glob("*.trace")):
+            thread_names, events = dict(), []
+            with open(path, "rb") as f:
+                while True:
+                    try:
+                        chunk_thread_names, chunk_events = pickle.load(f)
+                    except EOFError:
+                        break
+                    except Exception as e:
+                        report("prof", f"[!alert]Failed[/] to load trace of child process [!path]{shorten_path(path)}[/]: {e!r}", level=WARNING)
+                        break
+                    thread_names.update(chunk_thread_names)
+                    events += chunk_events
+            traces.append((int(path.stem), thread_names, events))
+        return traces
+
+    def _after_fork_in_child(self):
+        self._records = list()
+        self._records_lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_names = dict()
+        if self._events is not None:
+            self._events = list()
+        self._shipped_events = 0
+        if self._children_dir is not None:
+            self._ship_dir, self._children_dir = self._children_dir, None
+
+    def export_chrome_trace(self, path="trace.json"):
+        """Saves spans recorded with `trace` option in Chrome trace event format
+
+        Spans of child processes are included as separate processes of the trace.
+        Forked children inherit the option, spawned workers (e.g. joblib) record spans
+        only if they enable it too, e.g. at import of the module defining the steps.
+        The file can be opened in chrome://tracing or https://ui.perfetto.dev
+        """
+        if self._events is None:
+            raise ValueError("Tracing is disabled. Use profiler.set_option(\"trace\", True) to enable it.")
+        processes = [(os.getpid(), self._thread_names, self._events)] + self._child_traces()
+        trace_events = []
+        n_spans = 0
+        for pid, thread_names, events in processes:
+            trace_events += [
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                for tid, name in thread_names.items()
+            ]
+            # perf_counter is a system-wide monotonic clock, so spans of processes share the time axis
+            for name, start_ns, elapsed_ns, tid in events:
+                trace_events.append({
+                    "name": name, "ph": "X", "pid": pid, "tid": tid,
+                    "ts": start_ns / 1e3, "dur": elapsed_ns / 1e3,
+                })
+            n_spans += len(events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        report("prof", f"Saved trace of [!number]{n_spans}[/] spans of [!number]{len(processes)}[/] processes "
+                       f"to [!path]{shorten_path(path)}[/]")
 
     def pre_callback(self, callback):
         self._pre_callbacks.append(callback)
+        return callback
 
     def post_callback(self, callback):
         self._post_callbacks.append(callback)
+        return callback
 
     def final_callback(self, callback):
         self._final_callbacks.append(callback)
+        return callback
 
 profiler = Profiler()
 profile = profiler.profile
 
+_CHILDREN_DIR_ENV = "MINIKTS_PROFILER_CHILDREN_DIR"
+
+def _setup_children_dir():
+    """Chooses the directory child processes ship statistics to, called on the first `profile()`
+
+    The directory is created by the first child shipping statistics, so that processes
+    which never start profiled children leave nothing behind.
+    """
+    if profiler._children_dir is not None or profiler._ship_dir is not None:
+        return
+    # the variable is inherited by every subprocess, but only multiprocessing and joblib workers
+    # ship statistics: unrelated scripts (scheduler jobs, daemon, subprocess calls) run as MainProcess
+    value = os.environ.get(_CHILDREN_DIR_ENV, None)
+    if value is not None:
+        owner_pid, children_dir = value.split(":", 1)
+        if int(owner_pid) != os.getpid() and multiprocessing.current_process().name != "MainProcess":
+            profiler._ship_dir = Path(children_dir)
+            return
+    owner_pid = os.getpid()
+    children_dir = Path(tempfile.gettempdir()) / f"minikts-profiles-{secrets.token_hex(16)}"
+    os.environ[_CHILDREN_DIR_ENV] = f"{owner_pid}:{children_dir}"
+    profiler._children_dir = children_dir
+
+    @atexit.register
+    def remove_children_dir():
+        if os.getpid() == owner_pid:
+            shutil.rmtree(children_dir, ignore_errors=True)
+
+def _private_dir(path, create=False):
+    """Returns True if `path` is a directory accessible only by the user, creating it if asked"""
+    if create:
+        try:
+            path.mkdir(mode=0o700)
+        except FileExistsError:
+            pass
+        except OSError:
+            return False
+    try:
+        st = path.lstat()
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
 @register_postload_hook
 def set_profiler_options():
     if "profiler" in config:
         for option, value in config.profiler.items():
             profiler.set_option(option, value)
 
-@profiler.pre_callback
-def on_start_print(data, verbose=True, **k):
-    if not verbose:
+_MB = 2 ** 20
+_rss_sampler = RSSSampler()
+_memory_state = threading.local()
+_stack_sampler = StackSampler(ignored_files=[__file__])
+
+def _after_fork_in_child():
+    global _rss_sampler, _memory_state, _stack_sampler
+    profiler._after_fork_in_child()
+    _rss_sampler = RSSSampler(_rss_sampler.interval)
+    _memory_state = threading.local()
+    _stack_sampler = StackSampler(_stack_sampler.hz, _stack_sampler.ignored_files)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def on_start_track_memory(data, memory_top=0, **k):
+    if memory_top and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot() if memory_top else None
+    token, rss = _rss_sampler.start()
+    if not hasattr(_memory_state, "stack"):
+        _memory_state.stack = list()
+    _memory_state.stack.append((token, rss, snapshot))
+
+def on_stop_track_memory(data, memory_top=0, verbose=True, **k):
+    token, start_rss, start_snapshot = _memory_state.stack.pop()
+    rss, peak_rss = _rss_sampler.stop(token)
+    columns = data.stats.columns
+    rss_delta = (rss - start_rss) / _MB
+    heaviest = rss_delta >= columns.get(_RSS_DELTA_COLUMN, rss_delta)
+    columns[_RSS_DELTA_COLUMN] = max(columns.get(_RSS_DELTA_COLUMN, rss_delta), rss_delta)
+    columns["peak_rss (MB)"] = max(columns.get("peak_rss (MB)", 0), peak_rss / _MB)
+    if start_snapshot is None:
+        return
+    stat_diffs = tracemalloc.take_snapshot().compare_to(start_snapshot, "lineno")[:memory_top]
+    top_allocations = [
+        f"{shorten_path(diff.traceback[0].filename)}:{diff.traceback[0].lineno} {diff.size_diff / _MB:+.1f}MB"
+        for diff in stat_diffs
+    ]
+    if heaviest:
+        # allocations are reported for the call with the largest RSS delta
+        columns["top_allocations"] = "; ".join(top_allocations)
+    if verbose:
+        for allocation in top_allocations:
+            report("prof", f"Step [!step]{data.name}[/] allocated [!path]{allocation}[/]")
+
+def on_start_sample(data, **k):
+    _stack_sampler.enter()
+
+def on_stop_sample(data, **k):
+    _stack_sampler.exit()
+
+@profiler.final_callback
+def on_finish_save_flamegraph(profiler_stats, **k):
+    if not _stack_sampler.samples:
         return
-    report("prof", f"Step [!step]{data.name}[/] started")
-
-@profiler.pre_callback
-def on_start_set_timer(data, **k):
-    data.start = time.time()
-
-@profiler.pre_callback
-def on_start_increase_calls(data, **k):
-    if not "calls" in data:
-        data.calls = 0
-    data.calls += 1
-
-@profiler.post_callback
-def on_stop_save_timing(data, **k):
-    data.timing = time.time() - data.start
-    if "timings" not in data:
-        data.timings = list()
-    data.timings.append(data.timing)
-
-@profiler.post_callback
-def on_stop_print(data, verbose=True, **k):
-    if not verbose:
+    collapsed_path = ctx.workdir / "profile.collapsed"
+    flamegraph_path = ctx.workdir / "flamegraph.svg"
+    _stack_sampler.save_collapsed(collapsed_path)
+    _stack_sampler.save_flamegraph(flamegraph_path)
+    n_samples = sum(_stack_sampler.samples.values())
+    report("prof", f"Saved [!number]{n_samples}[/] stack samples to [!path]{shorten_path(collapsed_path)}[/] "
+                   f"and [!path]{shorten_path(flamegraph_path)}[/]")
+
+@profiler.final_callback
+def on_finish_save_history(profiler_stats, history=True, **k):
+    experiments_dir = ctx.experiments_dir
+    if not history or experiments_dir is None or experiments_dir not in ctx.workdir.parents:
         return
-    report("prof", f"Step [!step]{data.name}[/] finished, took [!time]{data.timing:.5f}s[/]")
+    from minikts.cache import cache_stats
+    record = make_record(profiler_stats, cache_stats(), config_fingerprint(config))
+    if record["steps"]:
+        save_record(record, ctx.workdir)
 
 @profiler.final_callback
-def on_finish_print(profiler_data, **k):
+def on_finish_print(profiler_stats, **k):
+    # pandas is imported on report, so that decorating functions with `profile` stays cheap
+    import pandas as pd
     timing_report = list()
-    for name, method_data in profiler_data.items():
+    for name, stats in profiler_stats.items():
+        if stats.calls == 0:
+            continue
         timing_report.append({
             "name": name,
-            "sum_time (s)": np.sum(method_data.timings),
-            "n_calls": method_data.calls,
-            "mean_time (s)": np.mean(method_data.timings),
-            "max_time (s)": np.max(method_data.timings),
+            "sum_time (s)": stats.sum_time,
+            "self_time (s)": stats.self_time,
+            "n_calls": stats.calls,
+            "mean_time (s)": stats.mean_time,
+            "p50_time (s)": stats.quantile_time(0.5),
+            "p95_time (s)": stats.quantile_time(0.95),
+            "p99_time (s)": stats.quantile_time(0.99),
+            "max_time (s)": stats.max_time,
+            **stats.columns,
         })
     timing_report = pd.DataFrame(timing_report)
     if timing_report.empty:
         return
     timing_report.sort_values("sum_time (s)", inplace=True, ascending=False)
     report_table("profiler report", timing_report)
+    worker_stats = profiler.get_worker_stats()
+    if len(worker_stats) < 2:
+        return
+    worker_report = pd.DataFrame([{
+        "worker": worker,
+        "name": name,
+        "sum_time (s)": stats.sum_time,
+        "n_calls": stats.calls,
+        "mean_time (s)": stats.mean_time,
+        "p95_time (s)": stats.quantile_time(0.95),
+        "max_time (s)": stats.max_time,
+    } for worker, worker_steps in worker_stats.items() for name, stats in worker_steps.items() if stats.calls])
+    report_table("profiler report per worker", worker_report)
+
+@profiler.final_callback
+def on_finish_print_call_tree(profiler_stats, **k):
+    import pandas as pd
+    call_tree = profiler.call_tree()
+    if all(depth == 0 for _, depth in call_tree):
+        return
+    tree_report = pd.DataFrame([{
+        "step": "  " * depth + node.name,
+        "n_calls": node.calls,
+        "total_time (s)": node.total_ns / 1e9,
+        "self_time (s)": node.self_ns / 1e9,
+    } for node, depth in call_tree])
+    report_table("profiler call tree", tree_report)
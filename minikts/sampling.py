@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import threading
+import zlib
+import contextlib
+from collections import Counter
+from html import escape
+
+import attr
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _collapse(frame, thread_name, ignored_files):
+    labels = []
+    while frame is not None:
+        if frame.f_code.co_filename not in ignored_files:
+            labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+@attr.s
+class StackSampler:
+    """Samples Python stacks of threads running profiled steps
+
+    A background thread wakes up `hz` times per second while at least
+    one thread is inside a profiled step and counts its collapsed stacks.
+
+    Args:
+        hz: sampling frequency
+        ignored_files: source files whose frames are omitted from stacks, e.g. of profiling wrappers
+    """
+    hz = attr.ib(default=100, type=float)
+    ignored_files = attr.ib(factory=frozenset, converter=lambda files: frozenset(files) | {__file__})
+    samples = attr.ib(factory=Counter, init=False, repr=False)
+    _active = attr.ib(factory=dict, init=False, repr=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+    _thread = attr.ib(default=None, init=False, repr=False)
+
+    def enter(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = self._active.get(ident, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="minikts-stack-sampler", daemon=True)
+                self._thread.start()
+
+    def exit(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._active.get(ident, 0) - 1
+            if depth > 0:
+                self._active[ident] = depth
+            else:
+                self._active.pop(ident, None)
+
+    @contextlib.contextmanager
+    def sampling(self):
+        """Samples the current thread inside the block"""
+        self.enter()
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def _run(self):
+        thread_names = dict()
+        while True:
+            time.sleep(1 / self.hz)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                idents = list(self._active)
+            for ident in idents:
+                frame = frames.get(ident, None)
+                if frame is None:
+                    # thread died without exiting, it must not keep the sampler running
+                    with self._lock:
+                        self._active.pop(ident, None)
+                    continue
+                if ident not in thread_names:
+                    thread_names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                self.samples[_collapse(frame, thread_names.get(ident, str(ident)), self.ignored_files)] += 1
+
+    def save_collapsed(self, path):
+        """Saves samples in collapsed stack format used by flamegraph.pl and speedscope"""
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def save_flamegraph(self, path, width=1200, row_height=16):
+        """Saves samples as SVG flamegraph, hover over frames to see full names"""
+        tree = dict()
+        for stack, count in self.samples.items():
+            node = tree
+            for label in stack.split(";"):
+                entry = node.setdefault(label, [0, dict()])
+                entry[0] += count
+                node = entry[1]
+        total = sum(self.samples.values())
+        rects = []
+
+        def layout(node, x, depth):
+            for label, (count, children) in sorted(node.items()):
+                w = width * count / total
+                if w >= 0.5:
+                    rects.append((x, depth, w, label, count))
+                    layout(children, x, depth + 1)
+                x += w
+
+        layout(tree, 0, 0)
+        max_depth = max((depth for _, depth, *_ in rects), default=0) + 1
+        height = max_depth * row_height
+        elements = []
+        for x, depth, w, label, count in rects:
+            y = height - (depth + 1) * row_height
+            hue = 20 + zlib.crc32(label.encode()) % 40
+            text = escape(label) if w > 7 * len(label) else escape(label[:max(int(w / 7) - 2, 0)] + "..") if w > 35 else ""
+            title = escape(f"{label}: {count} samples ({100 * count / total:.1f}%)")
+            elements.append(
+                f'<g><title>{title}</title>'
+                f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+                f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{text}</text></g>'
+            )
+        with open(path, "w") as f:
+            f.write(
+                f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'font-family="monospace" font-size="11">\n' + "\n".join(elements) + "\n</svg>\n"
+            )
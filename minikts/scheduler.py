@@ -0,0 +1,238 @@
+import os
+import time
+import shlex
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import attr
+
+from minikts.context import ctx
+from minikts.monitoring import WARNING, report, report_table
+
+BACKENDS = ("tmux", "subprocess")
+
+@attr.s
+class ProcessSlot:
+    """Slot running commands as background subprocesses, a drop-in replacement of tmux windows
+
+    Args:
+        name: slot name
+        env: environment variables set for commands, e.g. {"CUDA_VISIBLE_DEVICES": "0"}
+        log_dir: directory of logs, output of commands goes to `{log_dir}/{name}.log`,
+            Scheduler sets it to its status directory if not specified
+    """
+    name = attr.ib(type=str)
+    env = attr.ib(factory=dict)
+    log_dir = attr.ib(default=None)
+    _process = attr.ib(default=None, init=False, repr=False)
+
+    def run(self, cmd: str):
+        log_dir = Path(self.log_dir or tempfile.gettempdir())
+        with open(log_dir / f"{self.name}.log", "ab") as log:
+            self._process = subprocess.Popen(
+                cmd, shell=True, env={**os.environ, **self.env},
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+
+    def poll(self):
+        # reaps finished process, the exit status itself is read from the status file
+        if self._process is not None:
+            self._process.poll()
+
+def make_slots(
+    gpus: Sequence[int] = (),
+    n_cpu_slots: int = 0,
+    backend: str = "tmux",
+    session_name: Optional[str] = None,
+    log_dir: Optional[Union[Path, str]] = None,
+):
+    """Makes slots for Scheduler: one per GPU and `n_cpu_slots` slots without GPUs
+
+    Args:
+        gpus: indices of GPUs, each slot sees only its GPU
+        n_cpu_slots: number of slots with no GPU visible
+        backend: "tmux" for windows of `session_name`, "subprocess" for background processes
+        session_name: name of tmux session
+        log_dir: directory of logs of the subprocess backend
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {', '.join(BACKENDS)}")
+    if backend == "tmux":
+        if session_name is None:
+            raise ValueError("session_name is required for tmux backend")
+        from minikts.tmux import GPUWindow, Window
+        slots = [GPUWindow(session_name, gpu) for gpu in gpus]
+        first_cpu_index = max(gpus, default=-1) + 1
+        for i in range(n_cpu_slots):
+            window = Window(session_name, f"cpu-{i}", first_cpu_index + i)
+            window.run('export CUDA_VISIBLE_DEVICES=""')
+            slots.append(window)
+        return slots
+    slots = [ProcessSlot(f"gpu-{gpu}", {"CUDA_VISIBLE_DEVICES": str(gpu)}, log_dir) for gpu in gpus]
+    slots += [ProcessSlot(f"cpu-{i}", {"CUDA_VISIBLE_DEVICES": ""}, log_dir) for i in range(n_cpu_slots)]
+    return slots
+
+@attr.s
+class Job:
+    """Command dispatched by Scheduler
+
+    Attributes:
+        id: index of the job in the queue
+        cmd: shell command
+        status: one of "pending", "running", "done", "failed"
+        slot: name of the slot the job ran in
+        exit_code: exit code of the command
+        start_time: dispatch time
+        end_time: time the completion was noticed, up to `poll_interval` late
+    """
+    id = attr.ib(type=int)
+    cmd = attr.ib(type=str)
+    status = attr.ib(default="pending", type=str)
+    slot = attr.ib(default=None)
+    exit_code = attr.ib(default=None)
+    start_time = attr.ib(default=None)
+    end_time = attr.ib(default=None)
+
+    @property
+    def duration(self):
+        if self.start_time is None:
+            return None
+        return (self.end_time or time.time()) - self.start_time
+
+@attr.s
+class Scheduler:
+    """Runs a queue of shell commands, dispatching each to the first free slot
+
+    A slot is anything with `name` and `run(cmd)`: tmux windows, GPUWindows or ProcessSlots.
+    Commands are wrapped to write their exit code to a status file, which is how
+    the scheduler learns that a slot is free again.
+
+    Args:
+        slots: slots to run commands in, see `make_slots`
+        status_dir: directory of status files, defaults to a new directory in ctx.tmp_dir
+        poll_interval: seconds between checks of status files
+
+    Examples:
+        >>> slots = make_slots(gpus=range(8), session_name="competition-name")
+        >>> scheduler = Scheduler(slots)
+        >>> scheduler.run([f"python3 /path/to/main.py train --fold {i}" for i in range(20)])
+        >>> scheduler.stats()
+    """
+    slots = attr.ib(type=list, converter=list)
+    status_dir = attr.ib(default=None)
+    poll_interval = attr.ib(default=0.5, type=float)
+    jobs = attr.ib(factory=list, init=False)
+    _busy_time = attr.ib(factory=dict, init=False, repr=False)
+    _start_time = attr.ib(default=None, init=False, repr=False)
+    _end_time = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        if not self.slots:
+            raise ValueError("Scheduler needs at least one slot")
+        if self.status_dir is None:
+            if ctx.root_dir is not None:
+                parent, prefix = ctx.tmp_dir / "jobs", time.strftime("%Y%m%d-%H%M%S-")
+                parent.mkdir(exist_ok=True)
+            else:
+                parent, prefix = None, "minikts-jobs-"
+            self.status_dir = tempfile.mkdtemp(prefix=prefix, dir=parent)
+        self.status_dir = Path(self.status_dir)
+        self.status_dir.mkdir(parents=True, exist_ok=True)
+        for slot in self.slots:
+            if isinstance(slot, ProcessSlot) and slot.log_dir is None:
+                slot.log_dir = self.status_dir
+        self._busy_time = {slot.name: 0.0 for slot in self.slots}
+
+    def _status_path(self, job):
+        return self.status_dir / f"{job.id}.status"
+
+    def _wrap(self, job):
+        status_path = shlex.quote(str(self._status_path(job)))
+        tmp_path = shlex.quote(str(self._status_path(job).with_suffix(".tmp")))
+        return f"( {job.cmd} ); echo $? > {tmp_path}; mv {tmp_path} {status_path}"
+
+    def _dispatch(self, job, slot):
+        job.status = "running"
+        job.slot = slot.name
+        job.start_time = time.time()
+        report("jobs", f"[!tmux_name]{slot.name}[/] <- job [!number]{job.id}[/]: {job.cmd}")
+        slot.run(self._wrap(job))
+
+    def _check(self, job):
+        status_path = self._status_path(job)
+        if not status_path.exists():
+            return False
+        job.exit_code = int(status_path.read_text().strip() or -1)
+        job.end_time = time.time()
+        job.status = "done" if job.exit_code == 0 else "failed"
+        self._busy_time[job.slot] += job.duration
+        if job.status == "done":
+            report("jobs", f"Job [!number]{job.id}[/] finished in [!time]{job.duration:.1f}s[/] on [!tmux_name]{job.slot}[/]")
+        else:
+            report("jobs", f"Job [!number]{job.id}[/] [!alert]failed[/] with code [!number]{job.exit_code}[/] "
+                           f"on [!tmux_name]{job.slot}[/]", level=WARNING)
+        return True
+
+    def run(self, commands: List[str]):
+        """Runs commands and blocks until all of them finish
+
+        Returns:
+            List of jobs, in order of commands
+        """
+        offset = len(self.jobs)
+        jobs = [Job(offset + i, cmd) for i, cmd in enumerate(commands)]
+        self.jobs += jobs
+        pending = list(jobs)
+        running = dict()
+        self._start_time = self._start_time or time.time()
+        report("jobs", f"Running [!number]{len(jobs)}[/] jobs on [!number]{len(self.slots)}[/] slots, "
+                       f"status files in [!path]{self.status_dir}[/]")
+        while pending or running:
+            for slot in self.slots:
+                if hasattr(slot, "poll"):
+                    slot.poll()
+            for name, job in list(running.items()):
+                if self._check(job):
+                    del running[name]
+            for slot in self.slots:
+                if not pending:
+                    break
+                if slot.name not in running:
+                    running[slot.name] = job = pending.pop(0)
+                    self._dispatch(job, slot)
+            if pending or running:
+                time.sleep(self.poll_interval)
+        self._end_time = time.time()
+        stats = self.stats()
+        report("jobs", f"Finished [!number]{len(jobs)}[/] jobs in [!time]{stats['makespan']:.1f}s[/], "
+                       f"utilization [!number]{stats['utilization']:.0%}[/]")
+        return jobs
+
+    def stats(self):
+        """Returns utilization stats: makespan, share of busy slot time, and per slot busy time and job counts"""
+        end_time = self._end_time or time.time()
+        makespan = end_time - self._start_time if self._start_time is not None else 0.0
+        slots = dict()
+        for slot in self.slots:
+            busy = self._busy_time[slot.name]
+            slots[slot.name] = {
+                "jobs": sum(job.slot == slot.name for job in self.jobs),
+                "busy": busy,
+                "utilization": busy / makespan if makespan > 0 else 0.0,
+            }
+        total_busy = sum(self._busy_time.values())
+        return {
+            "makespan": makespan,
+            "utilization": total_busy / (makespan * len(self.slots)) if makespan > 0 else 0.0,
+            "failed": sum(job.status == "failed" for job in self.jobs),
+            "slots": slots,
+        }
+
+    def report_stats(self):
+        import pandas as pd
+        table = pd.DataFrame.from_dict(self.stats()["slots"], orient="index").rename_axis("slot").reset_index()
+        table = table.round({"busy": 2, "utilization": 3}).rename(columns={"busy": "busy (s)"})
+        report_table("slot utilization", table)
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import hashlib
+import inspect
+import functools
+import contextlib
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import attr
+
+from minikts.blobs import hash_file
+from minikts.config import config, read_config
+from minikts.context import ctx
+from minikts.monitoring import WARNING, report, report_table
+
+_STEPS = dict()
+
+@attr.s
+class RunOptions:
+    """Options of the current CLI invocation, set by `--force` and `--dry-run`"""
+    force = attr.ib(default=False, type=bool)
+    dry_run = attr.ib(default=False, type=bool)
+    plan = attr.ib(factory=list)
+
+_options = RunOptions()
+
+@contextlib.contextmanager
+def run_options():
+    """Gives fresh RunOptions to steps executed inside the block"""
+    global _options
+    previous, _options = _options, RunOptions()
+    try:
+        yield _options
+    finally:
+        _options = previous
+
+def _select(data, key):
+    for part in key.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+def _digest(obj):
+    dumped = json.dumps(obj, sort_keys=True, default=str)
+    return hashlib.sha256(dumped.encode()).hexdigest()[:16]
+
+@attr.s
+class Step:
+    """Step that is skipped when its inputs match a previous successful run, see `step`"""
+    function = attr.ib()
+    name = attr.ib(type=str)
+    config_keys = attr.ib(default=None)
+    sources = attr.ib(factory=list)
+    depends = attr.ib(factory=list)
+    outputs = attr.ib(factory=list)
+    config_arg = attr.ib(default="config_path", type=str)
+    overrides_arg = attr.ib(default="overrides", type=str)
+
+    def source_paths(self):
+        source_file = Path(inspect.getsourcefile(inspect.unwrap(self.function))).resolve()
+        paths = [source_file]
+        for pattern in self.sources:
+            paths += sorted(source_file.parent.glob(pattern))
+        return paths
+
+    def config_data(self, kwargs):
+        """Returns config the step will run with, reading it from the config argument if passed"""
+        filename = kwargs.get(self.config_arg, None)
+        if filename is not None:
+            return read_config(filename, kwargs.get(self.overrides_arg, None))
+        return config.to_dict()
+
+    def key(self, config_data):
+        """Returns digest of sources, config subtree and keys of upstream steps"""
+        if self.config_keys is None:
+            config_values = config_data
+        else:
+            config_values = {key: _select(config_data, key) for key in self.config_keys}
+        upstream = dict()
+        for name in self.depends:
+            if name not in _STEPS:
+                raise KeyError(f"Step {self.name} depends on unknown step {name}")
+            upstream[name] = _STEPS[name].key(config_data)
+        return _digest({
+            "name": self.name,
+            "sources": [hash_file(path) for path in self.source_paths()],
+            "config": config_values,
+            "upstream": upstream,
+        })
+
+    def fingerprint(self, kwargs):
+        """Returns digest of the step key and the call arguments"""
+        args = {name: value for name, value in kwargs.items() if name not in (self.config_arg, self.overrides_arg)}
+        return _digest({"key": self.key(self.config_data(kwargs)), "args": args})
+
+    def record_path(self, fingerprint):
+        return ctx.tmp_dir / "steps" / f"{self.name}-{fingerprint}.json"
+
+    def load_record(self, fingerprint):
+        """Returns record of a successful run with the fingerprint, if its outputs are still intact in the blob store"""
+        try:
+            with open(self.record_path(fingerprint)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        blob_store = ctx.blob_store
+        for digest in record["outputs"].values():
+            blob_path = blob_store.path(digest)
+            # hashes are cached by mtime, so only blobs modified since the last check are read again
+            if not blob_path.exists() or hash_file(blob_path) != digest:
+                return None
+        return record
+
+    def save_record(self, fingerprint, duration):
+        blob_store = ctx.blob_store
+        # outputs are relative to the workdir the step finished in, e.g. the experiment directory
+        workdir = ctx.workdir
+        outputs = dict()
+        for pattern in self.outputs:
+            paths = sorted(path for path in workdir.glob(pattern) if path.is_file())
+            if not paths:
+                report("steps", f"Output [!path]{pattern}[/] of [!path]{self.name}[/] matched no files", level=WARNING)
+            for path in paths:
+                outputs[str(path.relative_to(workdir))] = blob_store.put(path)
+        try:
+            workdir = workdir.relative_to(ctx.root_dir)
+        except ValueError:
+            pass
+        record = {"timestamp": time.time(), "duration": duration, "workdir": str(workdir), "outputs": outputs}
+        path = self.record_path(fingerprint)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def restore(self, record):
+        """Switches to the workdir the recorded run finished in and places its outputs there
+
+        Downstream steps then run in the same directory as after a real run of the step.
+        Outputs are placed as copies, since a later run of any step may rewrite them in place.
+        """
+        blob_store = ctx.blob_store
+        if "workdir" in record:
+            ctx.switch_workdir(ctx.root_dir / record["workdir"], create=True)
+        for relative_path, digest in record["outputs"].items():
+            path = ctx.workdir / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            blob_store.copy(digest, path)
+
+    def __call__(self, *args, **kwargs):
+        options = _options
+        fingerprint = self.fingerprint(kwargs)
+        record = None if options.force else self.load_record(fingerprint)
+        if options.dry_run:
+            if options.force:
+                reason = "forced"
+            elif record is None:
+                reason = "no previous run"
+            else:
+                reason = f"same inputs as run of {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['timestamp']))}"
+            action = "run" if record is None else "skip"
+            options.plan.append({"step": self.name, "action": action, "fingerprint": fingerprint, "reason": reason})
+            return None
+        if record is not None:
+            self.restore(record)
+            report("steps", f"Skip [!path]{self.name}[/]: inputs unchanged, "
+                            f"restored [!number]{len(record['outputs'])}[/] outputs, "
+                            f"saved [!time]{record['duration']:.1f}s[/]")
+            return None
+        start = time.time()
+        result = self.function(*args, **kwargs)
+        self.save_record(fingerprint, time.time() - start)
+        return result
+
+def step(
+    config_keys: Optional[List[str]] = None,
+    sources: Optional[List[str]] = None,
+    depends: Optional[List[str]] = None,
+    outputs: Optional[List[str]] = None,
+    name: Optional[str] = None,
+    config_arg: str = "config_path",
+    overrides_arg: str = "overrides",
+):
+    """Makes a CLI command incremental, like a make target
+
+    The fingerprint of a step combines hashes of its sources, the config subtree it reads,
+    keys of upstream steps and its arguments. When a previous successful run has the same
+    fingerprint, the step is skipped and its outputs are restored from the blob store.
+    Otherwise the step runs and its outputs are added to the blob store. Config is read
+    from the `config_arg` argument if the command has it, or taken from `config` otherwise.
+
+    `python main.py --force train test` runs steps regardless of fingerprints,
+    `python main.py --dry-run train test` prints which steps would run.
+
+    Args:
+        config_keys: dotted paths of config sections the step depends on, the whole config by default
+        sources: glob patterns of extra source files relative to the file defining the step
+        depends: names of upstream steps, whose inputs become inputs of this step
+        outputs: glob patterns of output files relative to the workdir the step finishes in,
+            a skipped step switches to that workdir, so downstream steps find the outputs
+        name: name of the step, defaults to the function name
+        config_arg: name of the argument with config path
+        overrides_arg: name of the argument with config overrides
+
+    Examples:
+        >>> class Experiment(CLI):
+        ...     @kts.config_option()
+        ...     @kts.step(config_keys=["hparams"], outputs=["local_cache/model_*.dill"])
+        ...     def train(self, config_path):
+        ...         ...
+        ...     @kts.config_option()
+        ...     @kts.step(config_keys=["hparams.split"], depends=["train"], outputs=["preds.csv"])
+        ...     def test(self, config_path):
+        ...         ...
+    """
+    def decorator(function: Callable):
+        incremental_step = Step(
+            function=function,
+            name=name or function.__name__,
+            config_keys=config_keys,
+            sources=list(sources or []),
+            depends=list(depends or []),
+            outputs=list(outputs or []),
+            config_arg=config_arg,
+            overrides_arg=overrides_arg,
+        )
+        _STEPS[incremental_step.name] = incremental_step
+
+        @functools.wraps(function)
+        def wrapped(*args, **kwargs):
+            return incremental_step(*args, **kwargs)
+        wrapped.__step__ = incremental_step
+        return wrapped
+    return decorator
+
+def is_step(function):
+    return hasattr(function, "__step__")
+
+def report_plan(plan):
+    import pandas as pd
+    table = pd.DataFrame(plan, columns=["step", "action", "fingerprint", "reason"])
+    report_table("plan", table)
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import itertools
+import traceback
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Optional
+
+import attr
+import numpy as np
+import pandas as pd
+try:
+    from scipy.stats import qmc
+except ImportError:
+    qmc = None
+try:
+    import threadpoolctl
+except ImportError:
+    threadpoolctl = None
+
+from minikts.callbacks.pruning import PruningCallback, TrialPruned, consume_interrupt
+from minikts.config import config, hparams
+from minikts.context import ctx
+from minikts.monitoring import WARNING, report, report_table
+from minikts.utils import find_next_of_format
+
+_METHODS = ("grid", "random", "sobol")
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+@attr.s
+class Trial:
+    """Trial of a sweep, passed to the trial function
+
+    Attributes:
+        id: id of the trial, equal to the name of its workdir
+        params: sampled values keyed by dotted paths in hparams
+        workdir: experiment directory of the trial
+        n_threads: thread budget, pass it to libraries like CatBoost or LightGBM
+        study: id of the sweep, trials of the same study are compared for pruning
+    """
+    id = attr.ib(type=str)
+    params = attr.ib(type=dict)
+    workdir = attr.ib(type=Path)
+    n_threads = attr.ib(default=1, type=int)
+    study = attr.ib(default="default", type=str)
+
+    def pruning_callback(self, **kwargs):
+        """Returns PruningCallback comparing this trial with other trials of the sweep"""
+        return PruningCallback(self.id, self.study, **kwargs)
+
+def _is_range(spec):
+    return isinstance(spec, dict) and "low" in spec and "high" in spec
+
+def _from_unit(spec, u):
+    """Maps u from [0, 1) to a value of the parameter"""
+    if not _is_range(spec):
+        return spec[min(int(u * len(spec)), len(spec) - 1)]
+    low, high = spec["low"], spec["high"]
+    if spec.get("log", False):
+        value = float(np.exp(np.log(low) + u * (np.log(high) - np.log(low))))
+    else:
+        value = low + u * (high - low)
+    if spec.get("int", False):
+        return int(min(round(value), high))
+    return value
+
+def _grid_values(name, spec):
+    if not _is_range(spec):
+        return list(spec)
+    if "n" not in spec:
+        raise ValueError(f"Range of {name} needs number of points `n` for grid sweep")
+    return [_from_unit(spec, u) for u in np.linspace(0, 1, spec["n"])]
+
+def expand_space(space: dict, method: str = "grid", n_trials: Optional[int] = None, seed: int = 0):
+    """Expands a search space into a list of trial parameters
+
+    Args:
+        space: dict mapping dotted hparams paths to a list of values or to a range
+            `{low, high, log=False, int=False}`, grid sweeps need also number of points `n` for ranges
+        method: one of "grid", "random", "sobol"
+        n_trials: number of trials for random and Sobol sweeps, the grid is truncated to it if provided
+        seed: random seed
+
+    Returns:
+        List of dicts mapping dotted paths to values
+
+    Examples:
+        >>> expand_space({"catboost.depth": [4, 6], "catboost.learning_rate": {"low": 0.01, "high": 0.3, "log": True}},
+        ...              method="random", n_trials=10)
+    """
+    if method not in _METHODS:
+        raise ValueError(f"Unknown sweep method {method}, expected one of {', '.join(_METHODS)}")
+    names = list(space)
+    if method == "grid":
+        grid = itertools.product(*[_grid_values(name, space[name]) for name in names])
+        return [dict(zip(names, values)) for values in itertools.islice(grid, n_trials)]
+    if n_trials is None:
+        raise ValueError(f"n_trials is required for {method} sweep")
+    if method == "random":
+        units = np.random.default_rng(seed).random((n_trials, len(names)))
+    else:
+        if qmc is None:
+            raise ImportError("Sobol sweep is available only if scipy is installed. "
+                              "Install it with `pip install scipy`.")
+        units = qmc.Sobol(d=len(names), scramble=True, seed=seed).random(n_trials)
+    return [{name: _from_unit(space[name], u) for name, u in zip(names, row)} for row in units]
+
+def _nest(params):
+    result = dict()
+    for key, value in params.items():
+        *parents, last = key.split(".")
+        node = result
+        for parent in parents:
+            node = node.setdefault(parent, dict())
+        node[last] = value
+    return result
+
+@contextlib.contextmanager
+def _thread_env(n_threads):
+    """Sets thread limits in the environment inherited by workers started meanwhile"""
+    saved = {var: os.environ.get(var, None) for var in _THREAD_ENV_VARS}
+    os.environ.update({var: str(n_threads) for var in _THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+def _run_trial(function, trial, root_dir, config_data):
+    ctx.root_dir = root_dir
+    ctx.switch_workdir(trial.workdir)
+    config.merge_update(config_data)
+    config.merge_update({"hparams": _nest(trial.params)})
+    hparams.merge_update(config.get("hparams", dict()))
+    result = {"id": trial.id, "params": trial.params, "status": "ok", "result": None, "error": None}
+    start = time.time()
+    try:
+        if threadpoolctl is not None:
+            with threadpoolctl.threadpool_limits(trial.n_threads):
+                result["result"] = function(trial)
+        else:
+            result["result"] = function(trial)
+    except TrialPruned as e:
+        result["status"] = "pruned"
+        result["error"] = str(e)
+    except KeyboardInterrupt:
+        if not consume_interrupt():
+            raise
+        result["status"] = "pruned"
+    except Exception:
+        result["status"] = "failed"
+        result["error"] = traceback.format_exc()
+    result["duration"] = time.time() - start
+    with open(trial.workdir / "trial.json", "w") as f:
+        json.dump(result, f, indent=2, default=str)
+    return result
+
+def _allocate_workdir(prefix):
+    experiments_dir = ctx.experiments_dir
+    if experiments_dir is None:
+        raise OSError("Experiments directory does not exist. Use minikts.init(root_dir=...) to set it.")
+    while True:
+        workdir = find_next_of_format(f"{prefix}-{{:d}}", parent_dir=experiments_dir)
+        try:
+            workdir.mkdir()
+            return workdir
+        except FileExistsError:
+            continue
+
+def sweep(
+    function: Callable,
+    space: Optional[dict] = None,
+    method: Optional[str] = None,
+    n_trials: Optional[int] = None,
+    n_workers: Optional[int] = None,
+    threads_per_trial: Optional[int] = None,
+    seed: int = 0,
+    prefix: str = "TRIAL",
+    start_method: Optional[str] = None,
+):
+    """Runs a function for each point of a search space over hparams in a process pool
+
+    Each trial runs in a worker process with hparams updated by the trial parameters,
+    workdir switched to its own experiment directory and thread count of BLAS/OpenMP
+    limited to `threads_per_trial`. Thread limits are applied with threadpoolctl if it is
+    installed. Otherwise they are set as `OMP_NUM_THREADS` etc. in the environment workers
+    start with, which forked workers ignore, since numpy is already imported by the parent;
+    pass `start_method="spawn"` then.
+    Workers share root_dir, so data and features saved to `global_cache` by one trial
+    are loaded by trials started after that. Writes to disk caches are atomic, trials
+    computing the same item concurrently both compute it.
+    Return value, status and duration of each trial are saved to `trial.json` in its workdir.
+    Arguments not provided are read from the `sweep` section of config.
+
+    Args:
+        function: picklable function of `Trial`, e.g. defined at module level, returning a score or a dict
+        space: dict mapping dotted hparams paths to values, see `expand_space`
+        method: one of "grid", "random", "sobol", defaults to "grid"
+        n_trials: number of trials for random and Sobol sweeps
+        n_workers: number of worker processes, defaults to number of CPUs
+        threads_per_trial: thread budget of a trial, defaults to CPUs divided by workers
+        seed: random seed
+        prefix: prefix of trial ids
+        start_method: start method of worker processes, e.g. "spawn", the platform default if not provided
+
+    Returns:
+        Dataframe with trial ids, parameters, results, statuses and durations
+
+    Examples:
+        >>> def train(trial):
+        ...     model = CatBoostClassifier(**hparams.catboost, thread_count=trial.n_threads)
+        ...     ...
+        ...     return score
+        >>> kts.sweep(train, {"catboost.depth": [4, 6, 8]}, n_workers=3)
+    """
+    options = config.get("sweep", dict())
+    space = space if space is not None else options.get("space", None)
+    if not space:
+        raise ValueError("Search space is empty. Pass it to sweep(...) or set it in `sweep.space` of config.")
+    method = method or options.get("method", "grid")
+    n_trials = n_trials or options.get("n_trials", None)
+    n_workers = n_workers or options.get("n_workers", None) or os.cpu_count()
+    threads_per_trial = threads_per_trial or options.get("threads_per_trial", None) or max(1, os.cpu_count() // n_workers)
+
+    trial_params = expand_space(dict(space), method, n_trials, seed)
+    study = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    config_data = config.to_dict()
+    report("sweep", f"Running [!number]{len(trial_params)}[/] trials on [!number]{n_workers}[/] workers, "
+                    f"[!number]{threads_per_trial}[/] threads each")
+    if threadpoolctl is None and (start_method or multiprocessing.get_start_method()) == "fork":
+        report("sweep", "Threads of forked workers [!alert]are not limited[/], install threadpoolctl "
+                        "or pass start_method=\"spawn\"", level=WARNING)
+    executor_kwargs = dict()
+    if start_method is not None:
+        executor_kwargs["mp_context"] = multiprocessing.get_context(start_method)
+    results = []
+    with _thread_env(threads_per_trial), ProcessPoolExecutor(max_workers=n_workers, **executor_kwargs) as executor:
+        futures = dict()
+        for params in trial_params:
+            workdir = _allocate_workdir(prefix)
+            trial = Trial(workdir.name, params, workdir, threads_per_trial, study)
+            futures[executor.submit(_run_trial, function, trial, ctx.root_dir, config_data)] = trial
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                # the worker died or the result could not be unpickled, e.g. BrokenProcessPool
+                trial = futures[future]
+                result = {"id": trial.id, "params": trial.params, "status": "failed", "result": None,
+                          "error": traceback.format_exc(), "duration": np.nan}
+            results.append(result)
+            if result["status"] == "ok":
+                report("sweep", f"Trial [!path]{result['id']}[/] finished in [!time]{result['duration']:.1f}s[/]: {result['result']}")
+            elif result["status"] == "pruned":
+                report("sweep", f"Trial [!path]{result['id']}[/] pruned after [!time]{result['duration']:.1f}s[/]")
+            else:
+                error = result["error"].strip().splitlines()[-1]
+                report("sweep", f"Trial [!path]{result['id']}[/] [!alert]failed[/]: {error}", level=WARNING)
+    table = pd.DataFrame([{
+        "id": result["id"],
+        **result["params"],
+        "result": result["result"],
+        "status": result["status"],
+        "duration (s)": result["duration"],
+    } for result in results])
+    table = table.sort_values("id", key=lambda ids: ids.str.rsplit("-", n=1).str[-1].astype(int)).reset_index(drop=True)
+    report_table("sweep results", table)
+    return table
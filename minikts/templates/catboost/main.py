@@ -139,7 +139,8 @@ class CatBoostTemplateExperiment(CLI):
         raw_outputs = pd.DataFrame(outputs)
         mean_outputs = pd.DataFrame(outputs.mean(axis=1))
         raw_outputs.to_csv("preds.csv", index=False)
-        mean_outputs.to_csv(f"submission_{self.logger.id}.csv", index=False)
+        # workdir is the experiment directory, also when train was skipped and created no logger
+        mean_outputs.to_csv(f"submission_{ctx.workdir.name}.csv", index=False)
 
     @kts.profile()
     def save_model(self, model, fold_idx):
@@ -150,9 +151,11 @@ class CatBoostTemplateExperiment(CLI):
         return cache.load_object(f"model_{fold_idx}")
 
     @kts.config_option()
+    @kts.overrides_option()
+    @kts.step(config_keys=["hparams"], outputs=["local_cache/*.dill"])
     @kts.profile()
-    def train(self, config_path):
-        kts.load_config(config_path)
+    def train(self, config_path, overrides):
+        kts.load_config(config_path, overrides=overrides)
         self.logger = kts.NeptuneLogger(**config.neptune)
         ctx.copy_sources()
 
@@ -163,9 +166,11 @@ class CatBoostTemplateExperiment(CLI):
             self.score_fold(model, data, fold_idx)
 
     @kts.config_option()
+    @kts.overrides_option()
+    @kts.step(config_keys=["hparams.split"], depends=["train"], outputs=["preds.csv", "submission_*.csv"])
     @kts.profile()
-    def test(self, config_path):
-        kts.load_config(config_path)
+    def test(self, config_path, overrides):
+        kts.load_config(config_path, overrides=overrides)
 
         dataset = self.dataset()
         outputs = list()
@@ -1,36 +1,137 @@
 import attr
 import libtmux
-from typing import Optional
+from typing import List, Optional
 
-from minikts.monitoring import report
+from minikts.monitoring import WARNING, report
+
+_WINDOW_FORMAT = "#{window_id}\t#{window_index}\t#{window_name}"
 
 @attr.s
 class Tmux:
+    """Handle of tmux server, shared by all sessions and windows of the process, see `shared_tmux`"""
     server = attr.ib(factory=libtmux.Server)
-    
+    _sessions = attr.ib(factory=dict, init=False, repr=False)
+
+    def cmd(self, *args):
+        """Runs tmux command, raising on errors
+
+        Returns:
+            List of output lines
+        """
+        proc = self.server.cmd(*args)
+        if proc.stderr:
+            raise libtmux.exc.LibTmuxException(proc.stderr)
+        return proc.stdout
+
+    def cmds(self, commands: List[List[str]]):
+        """Runs a sequence of tmux commands in a single tmux call"""
+        if not commands:
+            return
+        args = []
+        for command in commands:
+            if args:
+                args.append(";")
+            args += command
+        self.cmd(*args)
+
     def get_or_create_session(self, name: str):
-        session = self.server.find_where({"session_name": name})
-        created = False
-        if session is None:
-            report("tmux", f"Creating session [!tmux_name]{name}[/]")
-            session = self.server.new_session(name)
-            created = True
-        return session, created
+        """Returns True if the session was created"""
+        if self.server.has_session(name):
+            return False
+        report("tmux", f"Creating session [!tmux_name]{name}[/]")
+        self.cmd("new-session", "-d", "-s", name)
+        return True
+
+    def session(self, name: str):
+        """Returns Session with the name, cached per process
+
+        A cached session is recreated if it was killed since, e.g. by `tmux kill-session`.
+        """
+        session = self._sessions.get(name, None)
+        if session is None or not self.server.has_session(name):
+            session = self._sessions[name] = Session(name)
+        return session
+
+    def forget_session(self, name: str):
+        self._sessions.pop(name, None)
+
+_shared_tmux = None
+
+def shared_tmux():
+    """Returns Tmux handle shared by the process"""
+    global _shared_tmux
+    if _shared_tmux is None:
+        _shared_tmux = Tmux()
+    return _shared_tmux
+
+@attr.s
+class TmuxWindow:
+    """Window of a tmux session, a thin replacement of libtmux.Window
+
+    Unlike libtmux.Window, `index` is an int and attributes are not re-read from tmux.
+
+    Attributes:
+        id: tmux window id, e.g. "@3"
+        index: window index
+        name: window name
+    """
+    id = attr.ib(type=str)
+    index = attr.ib(type=int, converter=int)
+    name = attr.ib(type=str)
+    tmux = attr.ib(factory=shared_tmux, repr=False)
+
+    def send_keys(self, cmd: str, enter: bool = True):
+        self.tmux.cmd("send-keys", "-t", self.id, cmd, *(["Enter"] if enter else []))
+
+    def kill_window(self):
+        self.tmux.cmd("kill-window", "-t", self.id)
 
 @attr.s
 class Session:
     """Tmux session wrapper
-    
+
+    Windows are read with a single `list-windows` call per operation,
+    and the snapshot is updated locally after the operation changes them.
+
     Args:
         name: session name
     """
     name = attr.ib(type=str)
-    tmux = attr.ib(factory=Tmux, init=False, repr=False)
+    tmux = attr.ib(factory=shared_tmux, init=False, repr=False)
+    _windows = attr.ib(default=None, init=False, repr=False)
     def __attrs_post_init__(self):
-        self._session, created = self.tmux.get_or_create_session(self.name)
+        created = self.tmux.get_or_create_session(self.name)
         if created:
             self.shift_all_windows(100)
-        
+
+    def windows(self, refresh: bool = True):
+        """Returns windows of the session as TmuxWindow objects
+
+        Args:
+            refresh: if set to False, returns the snapshot of the last operation
+        """
+        if refresh or self._windows is None:
+            lines = self.tmux.cmd("list-windows", "-t", f"={self.name}", "-F", _WINDOW_FORMAT)
+            self._windows = []
+            for line in lines:
+                window_id, index, name = line.split("\t", 2)
+                self._windows.append(TmuxWindow(window_id, index, name, self.tmux))
+        return self._windows
+
+    def move_windows(self, moves: List[tuple]):
+        """Moves windows in a single tmux call
+
+        Args:
+            moves: list of (window, index) pairs, where window is returned by `windows`
+        """
+        commands = []
+        for window, index in moves:
+            report("tmux", f"Moving window [!tmux_name]{window.name}[/] from index [!number]{window.index}[/] to [!number]{index}[/] in session [!tmux_name]{self.name}[/]")
+            commands.append(["move-window", "-s", window.id, "-t", f"={self.name}:{index}"])
+        self.tmux.cmds(commands)
+        for window, index in moves:
+            window.index = int(index)
+
     def get_or_create_window(self, name: str, index: Optional[int] = None):
         """Returns a window with specified name and index
         
@@ -43,43 +144,53 @@ class Session:
             index: desired window index
             
         Returns:
-            libtmux.Window object
+            TmuxWindow, which replaced libtmux.Window to avoid a tmux call per attribute
         """
-        windows = self._session.windows
-        for window in windows:
+        if index == "":
+            index = None
+        for window in self.windows():
             if window.name == name:
-                if index is not None and window.index != str(index):
-                    window.move_window(index)
+                if index is not None and window.index != int(index):
+                    self.move_windows([(window, index)])
                 return window
         report("tmux", f"Creating window [!tmux_name]{name}[/] in session [!tmux_name]{self.name}[/]")
-        return self._session.new_window(window_name=name, window_index=index, attach=False)
-    
+        target = f"={self.name}:" if index is None else f"={self.name}:{index}"
+        line, = self.tmux.cmd("new-window", "-d", "-P", "-F", _WINDOW_FORMAT, "-t", target, "-n", name)
+        window_id, window_index, _ = line.split("\t", 2)
+        window = TmuxWindow(window_id, window_index, name, self.tmux)
+        self._windows.append(window)
+        return window
+
     def shift_all_windows(self, index_delta: int):
         """Shifts indices of all windows in the session by index_delta
         
         Args:
             index_delta: shift length
         """
-        for window in self._session.windows:
-            old_index = int(window.index)
-            new_index = old_index + index_delta
-            report("tmux", f"Moving window [!tmux_name]{window.name}[/] from index [!number]{old_index}[/] to [!number]{new_index}[/] in session [!tmux_name]{self.name}[/]")
-            window.move_window(new_index)
-            
+        # windows are moved starting from the shift direction, so that no target index is occupied
+        windows = sorted(self.windows(), key=lambda window: window.index, reverse=index_delta > 0)
+        self.move_windows([(window, window.index + index_delta) for window in windows])
+
     def close_windows(self, leave_session: bool = True):
         """Closes all windows in the session
         
         Args:
-            leave_session: if set to True, prevents session from closing
+            leave_session: if set to True, prevents session from closing,
+                otherwise the session is killed with its last window and is recreated on next use
         """
         sentinel = "tmux-keep"
         if leave_session:
             self.get_or_create_window(name=sentinel, index=100)
-        for window in self._session.windows:
+        commands = []
+        for window in self.windows(refresh=not leave_session):
             if leave_session and window.name == sentinel:
                 continue
-            report("tmux", f"[!alert]Killing[/] window [!tmux_name]{window.name}[/] in session [!tmux_name]{self.name}[/]")
-            window.kill_window()
+            report("tmux", f"[!alert]Killing[/] window [!tmux_name]{window.name}[/] in session [!tmux_name]{self.name}[/]", level=WARNING)
+            commands.append(["kill-window", "-t", window.id])
+        self.tmux.cmds(commands)
+        self._windows = [window for window in self._windows if leave_session and window.name == sentinel]
+        if not leave_session:
+            self.tmux.forget_session(self.name)
 
 @attr.s
 class Window:
@@ -94,8 +205,12 @@ class Window:
     window_name = attr.ib(type=str)
     window_index = attr.ib(default="", type=int)
     def __attrs_post_init__(self):
-        self.session = Session(self.session_name)
+        self.session = shared_tmux().session(self.session_name)
         self._window = self.session.get_or_create_window(name=self.window_name, index=self.window_index)
+
+    @property
+    def name(self):
+        return self.window_name
         
     def run(self, cmd: str):
         """Runs command in window
@@ -104,16 +219,15 @@ class Window:
             cmd: command
         """
         report("tmux", f"[!tmux_name]({self.session_name}/{self.window_name}) $[/] {cmd}")
-        self._window.attached_pane.send_keys(cmd)
-        
+        self._window.send_keys(cmd)
+
     def move(self, index: int):
         """Moves window to index
         
         Args:
             index: desired index
         """
-        report("tmux", f"Moving window [!tmux_name]{self.window_name}[/] from index [!number]{self._window.index}[/] to [!number]{index}[/] in session [!tmux_name]{self.session_name}[/]")
-        self._window.move_window(index)
+        self.session.move_windows([(self._window, index)])
         self.window_index = index
 
 @attr.s
@@ -3,6 +3,7 @@ import setuptools
 extras = {
     "neptune": ["neptune-client<=0.4.117", "PyJWT<=1.6.4"],
     "tmux": ["libtmux"],
+    "sweep": ["scipy", "threadpoolctl"],
 }
 
 all_deps = []
@@ -0,0 +1,16 @@
+import os
+
+from minikts.cache import LocalCache
+
+
+def test_save_object_replaces_file_instead_of_rewriting_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = LocalCache()
+    cache.save_object("model-A", "model")
+    path = tmp_path / "local_cache" / "model.dill"
+    linked = tmp_path / "blob"
+    os.link(path, linked)
+    cache.save_object("model-B", "model")
+    assert cache.load_object("model") == "model-B"
+    assert linked.read_bytes() != path.read_bytes()
+    assert [p.name for p in path.parent.iterdir()] == ["model.dill"]
@@ -0,0 +1,15 @@
+import pickle
+
+from minikts.config import FrozenConfig
+
+
+def test_frozen_config_keys_do_not_shadow_mapping_methods():
+    data = {"items": 3, "keys": [1, 2], "model": {"get": 0.5, "depth": 6}}
+    frozen = FrozenConfig(data)
+    assert frozen == FrozenConfig(data)
+    assert dict(frozen.items())["items"] == 3
+    assert frozen["keys"] == (1, 2)
+    assert frozen.model.depth == 6
+    assert frozen["model.get"] == 0.5
+    assert frozen.to_dict() == data
+    assert pickle.loads(pickle.dumps(frozen)) == frozen
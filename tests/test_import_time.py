@@ -0,0 +1,29 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+# cumulative import time of minikts.api in microseconds, ~30 ms on a laptop
+IMPORT_TIME_BUDGET_US = 300000
+HEAVY_MODULES = ["pandas", "numpy", "rich", "dill", "box", "click", "neptune"]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="exports are imported eagerly and -X importtime is missing on 3.6")
+def test_api_import_is_lazy():
+    code = f"import sys, json, minikts.api; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    assert json.loads(proc.stdout) == []
+    cumulative = dict()
+    for line in proc.stderr.splitlines():
+        _, self_us, cumulative_us, name = line.replace("|", ":").split(":")
+        if cumulative_us.strip().isdigit():
+            cumulative[name.strip()] = int(cumulative_us)
+    assert cumulative["minikts.api"] < IMPORT_TIME_BUDGET_US
+
+
+def test_api_exports_resolve():
+    import minikts.api as kts
+    assert kts.config is __import__("minikts.config", fromlist=["config"]).config
+    assert "sweep" in dir(kts)
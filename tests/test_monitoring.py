@@ -0,0 +1,14 @@
+import pytest
+
+from minikts.monitoring import INFO, WARNING, _parse_level
+
+
+def test_parse_level_accepts_names_and_numbers():
+    assert _parse_level("info") == INFO
+    assert _parse_level("30") == WARNING
+    assert _parse_level(WARNING) == WARNING
+
+
+def test_parse_level_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        _parse_level("verbose")
@@ -0,0 +1,69 @@
+import pickle
+from types import SimpleNamespace
+
+from minikts.callbacks.native import CatBoostAdapter, LightGBMAdapter, XGBoostAdapter
+
+
+class Recorder:
+    def __init__(self):
+        self.steps = []
+        self.finished = []
+
+    def __call__(self, record):
+        self.steps.append(record["step"])
+
+    def on_finish(self):
+        self.finished.append(self.steps[-1])
+
+
+def lightgbm_env(iteration, valid, end_iteration=100, params=None):
+    return SimpleNamespace(
+        model=None, params=params or dict(), iteration=iteration, begin_iteration=0, end_iteration=end_iteration,
+        evaluation_result_list=[("training", "l2", 1.0, False), ("valid_1", "l2", valid, False)],
+    )
+
+
+def test_lightgbm_adapter_finishes_on_last_iteration():
+    recorder = Recorder()
+    adapter = LightGBMAdapter(recorder)
+    for iteration in range(5):
+        adapter(lightgbm_env(iteration, 1.0, end_iteration=5))
+    assert recorder.finished == [5]
+
+
+def test_lightgbm_adapter_finishes_on_early_stopped_iteration():
+    recorder = Recorder()
+    adapter = LightGBMAdapter(recorder)
+    losses = [0.5, 0.4, 0.45, 0.46, 0.47, 0.48]
+    for iteration, loss in enumerate(losses):
+        adapter(lightgbm_env(iteration, loss, params={"early_stopping_round": 3}))
+        if recorder.finished:
+            break
+    assert recorder.finished == [5]
+
+
+def test_catboost_adapter_finishes_on_exit():
+    recorder = Recorder()
+    with CatBoostAdapter(recorder) as adapter:
+        for iteration in range(1, 4):
+            adapter.after_iteration(SimpleNamespace(iteration=iteration, metrics={"learn": {"Logloss": [0.5] * iteration}}))
+    assert recorder.finished == [2]
+
+
+def test_xgboost_adapter_is_picklable():
+    adapter = pickle.loads(pickle.dumps(XGBoostAdapter(names={"validation_0": "valid"})))
+    assert adapter.names == {"validation_0": "valid"}
+
+
+def test_adapters_stop_training_when_pruning_interrupted_main_thread():
+    from minikts.callbacks import pruning
+    catboost = CatBoostAdapter()
+    xgboost = XGBoostAdapter()
+    info = SimpleNamespace(iteration=1, metrics={"validation": {"AUC": [0.7]}})
+    assert catboost.after_iteration(info) and not xgboost.after_iteration(None, 0, dict())
+    pruning._interrupted_by_pruning.set()
+    try:
+        assert not catboost.after_iteration(info)
+        assert xgboost.after_iteration(None, 1, dict())
+    finally:
+        assert pruning.consume_interrupt()
@@ -0,0 +1,53 @@
+import os
+import time
+
+import pytest
+
+from minikts import parsing
+from minikts.parsing import FdCapture, StreamParser, parse_stdout
+
+
+def test_capture_fd_parses_native_output():
+    records = []
+    with parse_stdout(("step {step:d}",), records.append, capture_fd=True):
+        os.write(1, b"step 1\nstep 2\n")
+        print("step 3")
+    assert [record["step"] for record in records] == [1, 2, 3]
+
+
+def test_failed_capture_restores_started_ones(monkeypatch):
+    stdout_stat = os.fstat(1)
+    start = FdCapture.start
+
+    def failing_start(self):
+        if self.fd == 2:
+            raise OSError("cannot capture")
+        return start(self)
+
+    monkeypatch.setattr(FdCapture, "start", failing_start)
+    with pytest.raises(OSError):
+        with parse_stdout(("step {step:d}",), capture_fd=True, capture_stderr=True):
+            pass
+    assert os.fstat(1).st_ino == stdout_stat.st_ino
+
+
+def test_detached_reader_closes_descriptors(monkeypatch):
+    monkeypatch.setattr(parsing, "_FD_DRAIN_TIMEOUT", 0.1)
+    records = []
+    capture = FdCapture(1, StreamParser(("step {step:d}",), callbacks=[records.append])).start()
+    # a copy of the pipe end held by someone else keeps the reader alive after stop
+    held_fd = os.dup(1)
+    capture.stop()
+    read_fd, saved_fd = capture._read_fd, capture.saved_fd
+    os.fstat(saved_fd)
+    os.write(held_fd, b"step 1\n")
+    os.close(held_fd)
+    deadline = time.monotonic() + 5
+    while not capture._finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with capture._lock:
+        pass
+    assert [record["step"] for record in records] == [1]
+    for fd in (read_fd, saved_fd):
+        with pytest.raises(OSError):
+            os.fstat(fd)
@@ -0,0 +1,79 @@
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from minikts import profiler as profiler_module
+from minikts.profiler import Profiler
+
+
+def test_memory_tracking_stops_when_step_raises():
+    profiler = Profiler()
+    profiler.set_option("memory", True)
+
+    @profiler.profile(verbose=False)
+    def inner():
+        raise KeyboardInterrupt
+
+    @profiler.profile(verbose=False)
+    def outer():
+        with pytest.raises(KeyboardInterrupt):
+            inner()
+
+    outer()
+    assert not profiler_module._rss_sampler._peaks
+    assert not profiler_module._memory_state.stack
+    assert profiler.get_stats()["inner"].calls == 1
+
+
+def test_sampling_stops_when_step_raises():
+    profiler = Profiler()
+    profiler.set_option("sample", 200)
+
+    @profiler.profile(verbose=False)
+    def failing():
+        time.sleep(0.05)
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        failing()
+    sampler = profiler_module._stack_sampler
+    assert not sampler._active
+    n_samples = sum(sampler.samples.values())
+    time.sleep(0.1)
+    assert sum(sampler.samples.values()) == n_samples
+
+
+@profiler_module.profiler.profile(verbose=False)
+def _traced_step(x):
+    return x * 2
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_trace_includes_spans_of_child_processes(tmp_path):
+    profiler = profiler_module.profiler
+    profiler.set_option("trace", True)
+    try:
+        _traced_step(0)
+        with multiprocessing.get_context("fork").Pool(2) as pool:
+            pool.map(_traced_step, range(4))
+        path = tmp_path / "trace.json"
+        profiler.export_chrome_trace(path)
+    finally:
+        profiler.set_option("trace", False)
+    spans = [event for event in json.loads(path.read_text())["traceEvents"] if event["ph"] == "X"]
+    assert len(spans) == 5
+    assert len({span["pid"] for span in spans}) > 1
+
+
+def test_merge_keeps_allocations_of_heaviest_call():
+    light, heavy = profiler_module.StepStats("step"), profiler_module.StepStats("step")
+    light.columns.update({"max_rss_delta (MB)": 1.0, "peak_rss (MB)": 900.0, "top_allocations": "z.py:1 +1.0MB"})
+    heavy.columns.update({"max_rss_delta (MB)": 50.0, "peak_rss (MB)": 500.0, "top_allocations": "a.py:1 +50.0MB"})
+    for first, second in [(light, heavy), (heavy, light)]:
+        merged = profiler_module.StepStats("step")
+        merged.merge(first)
+        merged.merge(second)
+        assert merged.columns == {"max_rss_delta (MB)": 50.0, "peak_rss (MB)": 900.0, "top_allocations": "a.py:1 +50.0MB"}
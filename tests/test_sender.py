@@ -0,0 +1,54 @@
+import time
+import threading
+
+from minikts.loggers.sender import BackgroundSender, read_spool
+
+
+class SlowBackend:
+    """Stand-in for Neptune: slow, and rejecting non-increasing x like Neptune does"""
+    def __init__(self, latency=0.05, fail_first=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.points = []
+        self.lock = threading.Lock()
+
+    def __call__(self, kind, name, points):
+        time.sleep(self.latency)
+        with self.lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                raise ConnectionError("backend is down")
+            for x, y in points:
+                if self.points and x <= self.points[-1][0]:
+                    raise ValueError(f"x={x} is not increasing")
+                self.points.append((x, y))
+
+
+def test_overflow_keeps_order(tmp_path):
+    backend = SlowBackend()
+    sender = BackgroundSender(backend, tmp_path / "spool", batch_size=5, max_pending=10).start()
+    for i in range(100):
+        sender.send("metric", "loss", i, float(i))
+    sender.close(timeout=30)
+    assert [x for x, _ in backend.points] == list(range(100))
+    assert not (tmp_path / "spool").exists()
+
+
+def test_failed_delivery_is_replayed_in_order(tmp_path):
+    backend = SlowBackend(latency=0.01, fail_first=1)
+    sender = BackgroundSender(backend, tmp_path / "spool", batch_size=5, max_pending=10,
+                              max_retries=0, offline_period=0.05).start()
+    for i in range(50):
+        sender.send("metric", "loss", i, float(i))
+        time.sleep(0.002)
+    sender.close(timeout=30)
+    assert [x for x, _ in backend.points] == list(range(50))
+
+
+def test_undelivered_values_stay_in_spool(tmp_path):
+    backend = SlowBackend(latency=0, fail_first=10 ** 6)
+    sender = BackgroundSender(backend, tmp_path / "spool", max_retries=0, backoff=0).start()
+    for i in range(20):
+        sender.send("metric", "loss", i, float(i))
+    sender.close(timeout=30)
+    assert [args[0] for _, _, args in read_spool(tmp_path / "spool")] == list(range(20))
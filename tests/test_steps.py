@@ -0,0 +1,68 @@
+import os
+
+from minikts.context import ctx
+from minikts.steps import Step
+
+
+def test_skipped_step_restores_outputs_into_its_workdir(tmp_path, monkeypatch):
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    monkeypatch.setattr(ctx, "root_dir", tmp_path)
+    monkeypatch.chdir(src_dir)
+    calls = []
+
+    def train():
+        calls.append(1)
+        ctx.switch_workdir(tmp_path / "experiments" / "EXP-1", create=True)
+        (ctx.workdir / "local_cache").mkdir()
+        (ctx.workdir / "local_cache" / "model.dill").write_text("model")
+
+    step = Step(train, "train", outputs=["local_cache/*.dill"])
+    step()
+    os.remove(tmp_path / "experiments" / "EXP-1" / "local_cache" / "model.dill")
+    os.chdir(src_dir)
+    step()
+    assert len(calls) == 1
+    assert ctx.workdir == tmp_path / "experiments" / "EXP-1"
+    assert (ctx.workdir / "local_cache" / "model.dill").read_text() == "model"
+    assert not (src_dir / "local_cache").exists()
+
+
+def test_restored_outputs_do_not_share_blobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(ctx, "root_dir", tmp_path)
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def train(model):
+        calls.append(model)
+        # rewrites the file in place, like a writer not replacing it atomically
+        with open(tmp_path / "model.dill", "w") as f:
+            f.write(model)
+
+    step = Step(train, "train", outputs=["model.dill"])
+    step(model="A")
+    step(model="B")
+    step(model="A")
+    step(model="C")
+    step(model="A")
+    assert calls == ["A", "B", "C"]
+    assert (tmp_path / "model.dill").read_text() == "A"
+
+
+def test_modified_blob_invalidates_record(tmp_path, monkeypatch):
+    monkeypatch.setattr(ctx, "root_dir", tmp_path)
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def train():
+        calls.append(1)
+        (tmp_path / "model.dill").write_text("model")
+
+    step = Step(train, "train", outputs=["model.dill"])
+    step()
+    blob_path = ctx.blob_store.path(step.load_record(step.fingerprint(dict()))["outputs"]["model.dill"])
+    os.chmod(blob_path, 0o644)
+    blob_path.write_text("corrupted")
+    step()
+    assert len(calls) == 2
+    assert (tmp_path / "model.dill").read_text() == "model"